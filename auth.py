@@ -1,40 +1,133 @@
 import os
 import json
+import time
+import base64
+import asyncio
 import logging
 from fyers_apiv3.fyersModel import FyersModel, SessionModel  # Import both FyersModel and SessionModel
-from config import FYERS_APP_ID, FYERS_SECRET_KEY, FYERS_REDIRECT_URI
+from config import FYERS_APP_ID, FYERS_SECRET_KEY, FYERS_REDIRECT_URI, TOKEN_REFRESH_MARGIN_SECONDS
+from utils.helpers import configure_root_logging
 
-# Set up logging for authentication
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler("logs/fyersAuth.log"),
-                        logging.StreamHandler()
-                    ])
+try:
+    import orjson  # Much faster than stdlib json for small payloads
+except ImportError:
+    orjson = None
+
+# Set up logging for authentication (no-op if the process already configured logging)
+configure_root_logging("logs/fyersAuth.log",
+                       fmt='%(asctime)s - %(levelname)s - %(message)s')
 
 AUTH_CODE_FILE = "fyers_token.json"
 
+# In-process copy of the token file, keyed on its mtime so it is only re-parsed when it changes
+_TOKEN_CACHE = {"mtime": 0, "token": None, "exp": 0}
+
+# Token refreshes currently in progress, keyed by app_id, so concurrent callers share one login flow
+_refresh_inflight = {}
+
+
+def _loads(buf):
+    """Decodes the raw bytes of the token file."""
+    if orjson is not None:
+        return orjson.loads(buf)
+    return json.loads(buf)
+
+
+def _dumps(obj):
+    """Encodes the token data to bytes for the token file."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
 
-def get_fyers_access_token(app_id, secret_key, redirect_uri):
+def _jwt_exp(access_token):
     """
-    Generates and returns the Fyers access token.
-    If a valid token exists, it loads it. Otherwise, it initiates the login flow.
+    Returns the 'exp' claim (epoch seconds) of a JWT access token, or 0 if it cannot be decoded.
+    The signature is not verified; this is only used to refresh the token before it expires.
     """
-    if os.path.exists(AUTH_CODE_FILE):
-        try:
-            with open(AUTH_CODE_FILE, 'r') as f:
-                token_data = json.load(f)
-                access_token = token_data.get("access_token")
-                if access_token:
-                    logging.info("Loaded Fyers access token from file.")
-                    return access_token
-        except json.JSONDecodeError:
-            logging.warning(
-                f"Error decoding {AUTH_CODE_FILE}. Will generate new token.")
-        except Exception as e:
-            logging.error(
-                f"An unexpected error occurred while reading token file: {e}")
+    try:
+        payload = access_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return int(_loads(base64.urlsafe_b64decode(payload)).get("exp", 0))
+    except Exception:
+        return 0
+
+
+def get_token_expiry():
+    """Returns the expiry (epoch seconds) of the cached access token, or 0 if unknown."""
+    return _TOKEN_CACHE["exp"]
+
 
+def _read_token_file():
+    """Reads the token file with a single unbuffered read."""
+    fd = os.open(AUTH_CODE_FILE, os.O_RDONLY)
+    try:
+        return _loads(os.read(fd, 4096))
+    finally:
+        os.close(fd)
+
+
+def _write_token_file(token_data):
+    """
+    Atomically writes the token data to the token file and refreshes the in-process cache.
+    The data goes to a temp file first, so a crash mid-write never leaves a corrupt token file.
+    """
+    buf = _dumps(token_data)
+    tmp_path = AUTH_CODE_FILE + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, buf)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, AUTH_CODE_FILE)
+    _TOKEN_CACHE["mtime"] = os.stat(AUTH_CODE_FILE).st_mtime_ns
+    _TOKEN_CACHE["token"] = token_data.get("access_token")
+    _TOKEN_CACHE["exp"] = _jwt_exp(_TOKEN_CACHE["token"] or "")
+
+
+def _load_cached_token(min_validity=0):
+    """
+    Returns the access token from the in-process cache or the token file.
+    Returns None if no valid token is stored, or if it expires within min_validity seconds.
+    """
+    try:
+        st = os.stat(AUTH_CODE_FILE)
+    except FileNotFoundError:
+        return None
+
+    if st.st_mtime_ns == _TOKEN_CACHE["mtime"] and _TOKEN_CACHE["token"]:
+        if _TOKEN_CACHE["exp"] and time.time() >= _TOKEN_CACHE["exp"] - min_validity:
+            logging.info("Cached Fyers access token has expired.")
+            return None
+        return _TOKEN_CACHE["token"]
+    try:
+        token_data = _read_token_file()
+        access_token = token_data.get("access_token")
+        if access_token:
+            exp = _jwt_exp(access_token)
+            _TOKEN_CACHE["mtime"] = st.st_mtime_ns
+            _TOKEN_CACHE["token"] = access_token
+            _TOKEN_CACHE["exp"] = exp
+            if exp and time.time() >= exp - min_validity:
+                logging.info("Stored Fyers access token has expired.")
+                return None
+            logging.info("Loaded Fyers access token from file.")
+            return access_token
+    except ValueError:  # json.JSONDecodeError and orjson.JSONDecodeError
+        logging.warning(
+            "Error decoding %s. Will generate new token.", AUTH_CODE_FILE)
+    except Exception as e:
+        logging.error(
+            "An unexpected error occurred while reading token file: %s", e)
+    return None
+
+
+def _run_login_flow(app_id, secret_key, redirect_uri):
+    """
+    Runs the interactive Fyers login flow and saves the new access token.
+    This is blocking (user input + HTTP), so it is run in a worker thread.
+    """
     logging.info(
         "Fyers access token not found or invalid. Initiating login flow...")
 
@@ -52,7 +145,7 @@ def get_fyers_access_token(app_id, secret_key, redirect_uri):
     auth_code_url = session.generate_authcode()
 
     logging.info(
-        f"Please visit this URL to get your auth code: {auth_code_url}")
+        "Please visit this URL to get your auth code: %s", auth_code_url)
 
     auth_code = input(
         "After successful login and redirection, copy the 'auth_code' from the URL and paste it here: "
@@ -65,27 +158,73 @@ def get_fyers_access_token(app_id, secret_key, redirect_uri):
 
         if response.get("code") == 200:
             access_token = response["access_token"]
-            with open(AUTH_CODE_FILE, 'w') as f:
-                json.dump({"access_token": access_token}, f)
+            _write_token_file({"access_token": access_token})
             logging.info(
                 "Fyers access token generated and saved successfully.")
             return access_token
         else:
-            logging.error(f"Failed to generate access token: {response}")
+            logging.error("Failed to generate access token: %s", response)
             return None
     except Exception as e:
-        logging.error(f"Error during access token generation: {e}")
+        logging.error("Error during access token generation: %s", e)
         return None
 
 
+async def get_fyers_access_token(app_id, secret_key, redirect_uri, min_validity=0):
+    """
+    Generates and returns the Fyers access token.
+    If a valid token exists, it loads it. Otherwise, it initiates the login flow.
+    Concurrent callers share a single in-flight login flow per app_id.
+    :param min_validity: Seconds the stored token must still be valid for to be reused
+    """
+    access_token = _load_cached_token(min_validity)
+    if access_token:
+        return access_token
+
+    inflight = _refresh_inflight.get(app_id)
+    if inflight is not None:
+        # Shielded: a cancelled waiter must not cancel the flow the others share
+        return await asyncio.shield(inflight)
+
+    future = asyncio.get_running_loop().create_future()
+    _refresh_inflight[app_id] = future
+    try:
+        access_token = await asyncio.to_thread(_run_login_flow, app_id,
+                                               secret_key, redirect_uri)
+        future.set_result(access_token)
+        return access_token
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Marks it retrieved: without waiters asyncio would log it as never retrieved
+        raise
+    finally:
+        # Resolved on every path, e.g. the leader being cancelled, so waiters never hang
+        if not future.done():
+            future.cancel()
+        del _refresh_inflight[app_id]
+
+
+async def refresh_fyers_access_token(app_id=FYERS_APP_ID, secret_key=FYERS_SECRET_KEY,
+                                     redirect_uri=FYERS_REDIRECT_URI):
+    """
+    Returns (access token, expiry in epoch seconds) for a token valid for more than
+    TOKEN_REFRESH_MARGIN_SECONDS, running the login flow if the stored one expires sooner.
+    Meant as FyersTradeHandler's ensure_fresh_token; the token is None if the login flow failed.
+    """
+    access_token = await get_fyers_access_token(app_id, secret_key, redirect_uri,
+                                                min_validity=TOKEN_REFRESH_MARGIN_SECONDS)
+    return access_token, get_token_expiry() if access_token else 0
+
+
 if __name__ == "__main__":
     # Ensure the logs directory exists
     if not os.path.exists("logs"):
         os.makedirs("logs")
 
-    access_token = get_fyers_access_token(FYERS_APP_ID, FYERS_SECRET_KEY,
-                                          FYERS_REDIRECT_URI)
+    access_token = asyncio.run(
+        get_fyers_access_token(FYERS_APP_ID, FYERS_SECRET_KEY,
+                               FYERS_REDIRECT_URI))
     if access_token:
-        logging.info(f"Fyers API Access Token: {access_token}")
+        logging.info("Fyers API Access Token: %s", access_token)
     else:
         logging.error("Failed to retrieve Fyers API Access Token.")
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import time
 
 # --- Fyers API Configuration ---
@@ -13,6 +14,7 @@ FYERS_REDIRECT_URI = os.getenv(
     "FYERS_REDIRECT_URI",
     "https://trade.fyers.in/api-login/redirect-uri/index.html")
 FYERS_TOKEN_FILE = "fyers_token.json"  # File to store the access token
+TOKEN_REFRESH_MARGIN_SECONDS = 30  # Refresh the access token this many seconds before it expires
 
 # --- Telegram Bot Credentials (Optional, if using Telegram for alerts) ---
 # Set these as Replit Secrets: TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
@@ -56,6 +58,19 @@ SYMBOLS_TO_TRADE = [
     # Add more symbols here that your main.py should actively track and trade
 ]
 
+# --- Shared LTP memory (main.py -> dashboard/app.py) ---
+# main.py publishes the LTP of these symbols into a shared memory block that the dashboard reads.
+LTP_SHM_NAME = "gangu_ltp"
+SHARED_LTP_SYMBOLS = [s["fyers_symbol"] for s in SYMBOLS_TO_TRADE]
+
+# --- Dashboard push updates (main.py -> dashboard/app.py) ---
+# main.py pushes LTP and signal changes over a WebSocket so the dashboard only updates on change.
+DASHBOARD_PUSH_HOST = "0.0.0.0"
+DASHBOARD_PUSH_PORT = 8765
+DASHBOARD_PUSH_URL = f"ws://127.0.0.1:{DASHBOARD_PUSH_PORT}"
+# The dashboard redraws live data this often, so main.py pushes changed LTPs at the same cadence
+DASHBOARD_REFRESH_SECONDS = 1.0
+
 # Market Open/Close Times (UTC)
 # Fyers real-time data and historical data often use UTC.
 # IST (Indian Standard Time) is UTC+5:30.
@@ -124,8 +139,13 @@ DASHBOARD_CONFIG = {
 LOGS_DIR = "logs"
 FYERS_DATA_SOCKET_LOG = os.path.join(LOGS_DIR, "fyersDataSocket.log")
 FYERS_REQUESTS_LOG = os.path.join(LOGS_DIR, "fyersRequests.log")
+# Level of the per-tick Fyers data socket logger (FyersWebsocket), e.g. INFO while debugging
+FYERS_DATA_LOG_LEVEL = os.getenv("FYERS_DATA_LOG_LEVEL", "WARNING")
 APPLICATION_LOG = os.path.join(LOGS_DIR,
                                "application.log")  # Main application log
+# Directory the Fyers SDK writes its own log files to. Kept on tmpfs (RAM) when available
+# so SDK calls such as place_order don't wait on disk writes.
+FYERS_SDK_LOG_PATH = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
 
 # Create logs directory if it doesn't exist
 os.makedirs(LOGS_DIR, exist_ok=True)
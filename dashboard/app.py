@@ -1,25 +1,25 @@
 import streamlit as st
 import pandas as pd
-import asyncio
-import requests
-import json
+import numpy as np
 import time
 import logging
-import os
 import random
+import sys
 # Assuming these imports will eventually come from your main application logic
 # from fyers_api.auth import FyersAuth
 # from fyers_api.websocket_manager import FyersWebSocketManager
 # from fyers_api.trade_handler import FyersTradeHandler
 # from telegram_bot.bot import TelegramBot
-from config import DASHBOARD_CONFIG, LOGS_DIR, APPLICATION_LOG # Import from parent directory
+from config import DASHBOARD_CONFIG, APPLICATION_LOG, LTP_SHM_NAME, SHARED_LTP_SYMBOLS, DASHBOARD_PUSH_URL, DASHBOARD_REFRESH_SECONDS # Import from parent directory
+from utils.shared_ltp import SharedLTPBuffer
+from utils.dashboard_push import DashboardPushClient
+from utils.helpers import configure_root_logging
+from utils.records import TradeRecord
 
 # Setup logging for the dashboard
 dashboard_logger = logging.getLogger(__name__)
-# Ensure logs directory exists
-os.makedirs(LOGS_DIR, exist_ok=True)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    handlers=[logging.FileHandler(APPLICATION_LOG), logging.StreamHandler()])
+# Streamlit reruns this script in the same process, so configure the root logger only once
+configure_root_logging(APPLICATION_LOG)
 
 
 st.set_page_config(layout="wide")
@@ -31,14 +31,51 @@ if 'active_signals' not in st.session_state:
     st.session_state.active_signals = {} # {symbol: {"signal_type": "BUY/SELL", "price": ltp, "strategy": "ORB"}}
 
 if 'trade_status' not in st.session_state:
-    st.session_state.trade_status = {} # {order_id: {"symbol": symbol, "status": "PENDING/FILLED", "pnl": 0}}
+    st.session_state.trade_status = {} # {order_id: TradeRecord}
+
+_intern = sys.intern
+
+ORDER_HISTORY_COLUMNS = ["Order ID", "Symbol", "Type", "Entry Price", "Exit Price", "PnL", "Strategy", "Time"]
 
 if 'order_history' not in st.session_state:
-    st.session_state.order_history = [] # List of executed trades
+    st.session_state.order_history = pd.DataFrame(columns=ORDER_HISTORY_COLUMNS) # Executed trades, appended in place
 
 if 'ltp_data' not in st.session_state:
     st.session_state.ltp_data = {s['fyers_symbol']: 0.0 for s in DASHBOARD_CONFIG['symbols']} # Live LTP cache
 
+# --- Values derived from DASHBOARD_CONFIG ---
+# The whole script reruns on every interaction, so these are built once per session.
+if 'strategy_keys' not in st.session_state:
+    st.session_state.strategy_keys = tuple(DASHBOARD_CONFIG['strategies'].keys())
+    st.session_state.symbol_names = tuple(s['name'] for s in DASHBOARD_CONFIG['symbols'])
+    st.session_state.fyers_symbols = tuple(s['fyers_symbol'] for s in DASHBOARD_CONFIG['symbols'])
+    st.session_state.name_to_fyers = dict(zip(st.session_state.symbol_names, st.session_state.fyers_symbols))
+
+_STRATEGY_KEYS = st.session_state.strategy_keys
+_SYMBOL_NAMES = st.session_state.symbol_names
+_FYERS_SYMBOLS = st.session_state.fyers_symbols
+_NAME_TO_FYERS = st.session_state.name_to_fyers # Symbol name -> Fyers symbol, for the manual trade path
+_N_SYMBOLS = len(_SYMBOL_NAMES)
+
+# --- Pushed updates from main.py (WebSocket) ---
+@st.cache_resource
+def _get_push_client():
+    """One client (thread and connection) per process, shared by all sessions."""
+    return DashboardPushClient(DASHBOARD_PUSH_URL)
+
+if 'push_updates' not in st.session_state:
+    st.session_state.push_updates = _get_push_client().subscribe()
+
+# --- Live LTPs from main.py (shared memory) ---
+# Read once on attach for the current snapshot; later changes arrive through the push client.
+if st.session_state.get('shared_ltp') is None:
+    try:
+        st.session_state.shared_ltp = SharedLTPBuffer(SHARED_LTP_SYMBOLS, LTP_SHM_NAME)
+        st.session_state.ltp_data.update(st.session_state.shared_ltp.read())
+        dashboard_logger.info("Attached to shared LTP memory from main.py.")
+    except FileNotFoundError:
+        st.session_state.shared_ltp = None # main.py not running yet; retried on next rerun
+
 # --- Sidebar Configuration ---
 st.sidebar.header("Configuration")
 
@@ -47,14 +84,13 @@ st.sidebar.info("Replit Keep-Alive: Ensure your main trading script is running i
 
 # Strategy Selection
 st.sidebar.subheader("Strategy Modes")
-strategy_options = list(DASHBOARD_CONFIG['strategies'].keys())
-selected_strategy = st.sidebar.selectbox("Select Strategy:", options=strategy_options, 
-                                        index=strategy_options.index(DASHBOARD_CONFIG['current_strategy_mode']))
+selected_strategy = st.sidebar.selectbox("Select Strategy:", options=_STRATEGY_KEYS, 
+                                        index=_STRATEGY_KEYS.index(DASHBOARD_CONFIG['current_strategy_mode']))
 
 if selected_strategy != DASHBOARD_CONFIG['current_strategy_mode']:
     DASHBOARD_CONFIG['current_strategy_mode'] = selected_strategy
     st.session_state.active_signals = {} # Clear signals on strategy change
-    dashboard_logger.info(f"Strategy mode changed to: {selected_strategy}")
+    dashboard_logger.info("Strategy mode changed to: %s", selected_strategy)
 
 # Strategy Toggles
 for strategy, params in DASHBOARD_CONFIG['strategies'].items():
@@ -68,15 +104,15 @@ DASHBOARD_CONFIG['auto_trading_enabled'] = st.sidebar.checkbox(
 st.sidebar.markdown("---")
 st.sidebar.subheader("Manual Trade")
 manual_symbol = st.sidebar.selectbox("Select Symbol for Manual Trade:", 
-                                     options=[s['name'] for s in DASHBOARD_CONFIG['symbols']])
+                                     options=_SYMBOL_NAMES)
 manual_trade_type = st.sidebar.radio("Trade Type:", ["BUY", "SELL"])
 manual_quantity = st.sidebar.number_input("Quantity:", min_value=1, value=1, step=1)
 
 if st.sidebar.button("Execute Manual Trade"):
-    selected_fyers_symbol = next((s['fyers_symbol'] for s in DASHBOARD_CONFIG['symbols'] if s['name'] == manual_symbol), None)
+    selected_fyers_symbol = _NAME_TO_FYERS.get(manual_symbol)
     if selected_fyers_symbol:
         # In a real scenario, this would trigger the FyersTradeHandler
-        dashboard_logger.info(f"Manual Trade initiated: {manual_trade_type} {manual_quantity} {manual_symbol} ({selected_fyers_symbol})")
+        dashboard_logger.info("Manual Trade initiated: %s %s %s (%s)", manual_trade_type, manual_quantity, manual_symbol, selected_fyers_symbol)
         st.sidebar.success(f"Manual trade initiated for {manual_trade_type} {manual_quantity} {manual_symbol}")
         # Placeholder for actual trade execution
         # try:
@@ -88,57 +124,6 @@ if st.sidebar.button("Execute Manual Trade"):
     else:
         st.sidebar.error("Invalid symbol selected for manual trade.")
 
-# --- Main Dashboard Layout ---
-st.header("Live Market Data")
-
-# Display live LTP for subscribed symbols
-ltp_cols = st.columns(len(DASHBOARD_CONFIG['symbols']))
-for i, symbol_info in enumerate(DASHBOARD_CONFIG['symbols']):
-    with ltp_cols[i]:
-        st.metric(label=f"{symbol_info['name']} LTP", value=f"₹ {st.session_state.ltp_data.get(symbol_info['fyers_symbol'], 'N/A'):.2f}")
-
-
-st.markdown("---")
-st.header("Active Signals")
-
-if st.session_state.active_signals:
-    signals_df = pd.DataFrame([
-        {"Symbol": k.split(':')[1] if ':' in k else k, 
-         "Type": v["signal_type"], 
-         "Price": f"₹ {v['price']:.2f}", 
-         "Strategy": v["strategy"],
-         "Time": v["time"]} 
-        for k, v in st.session_state.active_signals.items()
-    ])
-    st.table(signals_df)
-else:
-    st.info("No active signals yet.")
-
-st.markdown("---")
-st.header("Trade Status")
-
-if st.session_state.trade_status:
-    trade_status_df = pd.DataFrame([
-        {"Order ID": k, 
-         "Symbol": v["symbol"], 
-         "Status": v["status"], 
-         "PnL": f"₹ {v['pnl']:.2f}",
-         "Trailing SL/Target": v.get("trailing_sl_target", "N/A")} # Placeholder for trailing SL/Target
-        for k, v in st.session_state.trade_status.items()
-    ])
-    st.table(trade_status_df)
-else:
-    st.info("No active trades.")
-
-st.markdown("---")
-st.header("Order History")
-
-if st.session_state.order_history:
-    history_df = pd.DataFrame(st.session_state.order_history)
-    st.table(history_df)
-else:
-    st.info("No order history yet.")
-
 # --- Real-time updates (Simulated/Placeholder) ---
 # In a real setup, Streamlit would communicate with your main.py process
 # via a message queue (Redis, RabbitMQ) or a shared file/database.
@@ -147,26 +132,27 @@ else:
 # Function to simulate real-time LTP updates
 # This function would ideally be replaced by reading from a shared memory/file
 # or a message queue that main.py writes to.
-async def fetch_live_data_for_dashboard():
+def fetch_live_data_for_dashboard():
     dashboard_logger.debug("Fetching live data for dashboard...")
-    # This is a mock. In reality, main.py would update a shared state (e.g., JSON file)
-    # or expose an internal API endpoint.
+    # This is a mock. Live LTPs come from main.py via shared memory (see live_data_panel).
     
-    # For demonstration, we'll simulate random LTP updates
-    for symbol_info in DASHBOARD_CONFIG['symbols']:
-        fyers_symbol = symbol_info['fyers_symbol']
-        current_ltp = st.session_state.ltp_data.get(fyers_symbol, 0.0)
-        # Simulate small random change
-        if current_ltp == 0.0:
-            current_ltp = 100.0 # Starting point for simulation
-        
-        change = (random.random() - 0.5) * current_ltp * 0.005 # +/- 0.5% change
-        st.session_state.ltp_data[fyers_symbol] = max(0.01, current_ltp + change)
+    # For demonstration, we'll simulate random LTP updates when main.py is not publishing live prices
+    if st.session_state.shared_ltp is None:
+        if 'sim_ltps' not in st.session_state:
+            st.session_state.sim_rng = np.random.default_rng()
+            st.session_state.sim_ltps = np.array(
+                [st.session_state.ltp_data.get(fyers_symbol, 0.0) for fyers_symbol in _FYERS_SYMBOLS],
+                dtype=np.float64)
+        ltps = st.session_state.sim_ltps
+        ltps[ltps == 0.0] = 100.0 # Starting point for simulation
+        # Simulate small random change for all symbols at once
+        ltps += (st.session_state.sim_rng.random(len(ltps)) - 0.5) * ltps * 0.005 # +/- 0.5% change
+        np.maximum(ltps, 0.01, out=ltps)
+        st.session_state.ltp_data.update(zip(_FYERS_SYMBOLS, ltps.tolist()))
     
     # Simulate signals (for demonstration)
     if random.random() < 0.1: # 10% chance to generate a signal
-        random_symbol_info = random.choice(DASHBOARD_CONFIG['symbols'])
-        random_fyers_symbol = random_symbol_info['fyers_symbol']
+        random_fyers_symbol = random.choice(_FYERS_SYMBOLS)
         random_signal_type = random.choice(["BUY", "SELL"])
         st.session_state.active_signals[random_fyers_symbol] = {
             "signal_type": random_signal_type,
@@ -174,73 +160,118 @@ async def fetch_live_data_for_dashboard():
             "strategy": DASHBOARD_CONFIG['current_strategy_mode'],
             "time": pd.Timestamp.now().strftime("%H:%M:%S")
         }
-        dashboard_logger.info(f"Simulated signal for {random_fyers_symbol}: {random_signal_type}")
+        dashboard_logger.info("Simulated signal for %s: %s", random_fyers_symbol, random_signal_type)
 
     # Simulate trade status updates (for demonstration)
     if random.random() < 0.05 and st.session_state.active_signals: # 5% chance to "fill" a signal
         try:
             signal_symbol, signal_data = random.choice(list(st.session_state.active_signals.items()))
             order_id = f"ORDER_{int(time.time() * 1000)}"
-            st.session_state.trade_status[order_id] = {
-                "symbol": signal_symbol,
-                "status": "FILLED",
-                "pnl": round((random.random() - 0.5) * 1000, 2), # Random PnL
-                "trailing_sl_target": "SL: N/A, Target: N/A" # Placeholder
-            }
-            st.session_state.order_history.append({
-                "Order ID": order_id,
-                "Symbol": signal_symbol,
-                "Type": signal_data["signal_type"],
-                "Entry Price": f"₹ {signal_data['price']:.2f}",
-                "Exit Price": "N/A", # Will be updated on exit
-                "PnL": st.session_state.trade_status[order_id]['pnl'],
-                "Strategy": signal_data["strategy"],
-                "Time": pd.Timestamp.now().strftime("%H:%M:%S")
-            })
+            st.session_state.trade_status[order_id] = TradeRecord(
+                order_id=order_id,
+                symbol=_intern(signal_symbol),
+                status="FILLED",
+                pnl=round((random.random() - 0.5) * 1000, 2), # Random PnL
+                trailing_sl_target="SL: N/A, Target: N/A" # Placeholder
+            )
+            history = st.session_state.order_history
+            # Symbol/type/strategy repeat across rows; interned they share one string object
+            history.loc[len(history)] = [
+                order_id,
+                _intern(signal_symbol),
+                _intern(signal_data["signal_type"]),
+                f"₹ {signal_data['price']:.2f}",
+                "N/A", # Exit Price, will be updated on exit
+                st.session_state.trade_status[order_id].pnl,
+                _intern(signal_data["strategy"]),
+                pd.Timestamp.now().strftime("%H:%M:%S"),
+            ]
             del st.session_state.active_signals[signal_symbol] # Remove from active signals
-            dashboard_logger.info(f"Simulated trade filled for {signal_symbol}. Order ID: {order_id}")
+            dashboard_logger.info("Simulated trade filled for %s. Order ID: %s", signal_symbol, order_id)
         except IndexError:
             pass # No signals to process
 
-    st.experimental_rerun() # Rerun to update the dashboard
 
+# --- Cached table builders ---
+# Keyed on immutable snapshots of the session state so the DataFrames are only rebuilt when the data changes.
+@st.cache_data(show_spinner=False, ttl=1)
+def _signals_df(frozen_signals):
+    return pd.DataFrame([
+        {"Symbol": k.split(':')[1] if ':' in k else k, 
+         "Type": signal_type, 
+         "Price": f"₹ {price:.2f}", 
+         "Strategy": strategy,
+         "Time": signal_time} 
+        for k, signal_type, price, strategy, signal_time in frozen_signals
+    ])
 
-if st.button("Refresh Dashboard Data"):
-    asyncio.run(fetch_live_data_for_dashboard()) # Manually trigger for testing
+
+@st.cache_data(show_spinner=False, ttl=1)
+def _trade_status_df(frozen_trades):
+    return pd.DataFrame([
+        {"Order ID": k, 
+         "Symbol": symbol, 
+         "Status": status, 
+         "PnL": f"₹ {pnl:.2f}",
+         "Trailing SL/Target": trailing_sl_target} # Placeholder for trailing SL/Target
+        for k, symbol, status, pnl, trailing_sl_target in frozen_trades
+    ])
 
 
-# Auto-refresh mechanism (consider carefully for production)
-# You might want to use st.rerun() or a timed callback from the main app
-# This setup requires a robust IPC mechanism.
+# --- Main Dashboard Layout ---
+# Only this fragment is re-executed every DASHBOARD_REFRESH_SECONDS; the sidebar and the rest of the script
+# are not rerun for data updates.
+@st.fragment(run_every=DASHBOARD_REFRESH_SECONDS)
+def live_data_panel():
+    if st.button("Refresh Dashboard Data"):
+        fetch_live_data_for_dashboard() # Manually trigger for testing
+
+    # Apply only what main.py pushed since the last run; nothing is re-read when nothing changed
+    for update in st.session_state.push_updates.drain():
+        st.session_state.ltp_data.update(update.get("ltp", {}))
+        st.session_state.active_signals.update(update.get("signals", {}))
+
+    st.header("Live Market Data")
+
+    # Display live LTP for subscribed symbols
+    ltp_cols = st.columns(_N_SYMBOLS)
+    for i in range(_N_SYMBOLS):
+        with ltp_cols[i]:
+            st.metric(label=f"{_SYMBOL_NAMES[i]} LTP", value=f"₹ {st.session_state.ltp_data.get(_FYERS_SYMBOLS[i], 'N/A'):.2f}")
+
+
+    st.markdown("---")
+    st.header("Active Signals")
+
+    if st.session_state.active_signals:
+        signals_df = _signals_df(tuple(
+            (k, v["signal_type"], v["price"], v["strategy"], v["time"])
+            for k, v in st.session_state.active_signals.items()))
+        st.table(signals_df)
+    else:
+        st.info("No active signals yet.")
 
-# Simple auto-refresh using time.sleep and st.experimental_rerun()
-# Note: This blocks Streamlit's execution for the sleep duration.
-# For production, consider using Streamlit's native data update mechanisms
-# or a background process that updates a shared resource (e.g., Redis, a file).
-import random
-# Simulate refresh every few seconds
-# This needs to be carefully managed in Streamlit as it reruns the whole script.
-# For now, relying on manual refresh button or IPC from main.py
-# if st.session_state.get('auto_refresh', False): # A toggle for auto-refresh
-#    time.sleep(5)
-#    st.experimental_rerun()
-
-# To get actual live data, your `main.py` needs to periodically write the `ltp_cache`
-# and other states to a file (e.g., JSON) that `dashboard/app.py` can read.
-
-# For example, in main.py, you could save data:
-# with open('live_data.json', 'w') as f:
-#     json.dump({"ltp_cache": websocket_manager.get_ltp_cache(), 
-#                 "active_signals": {...}, 
-#                 "trade_status": {...}}, f)
-
-# And in dashboard/app.py, read it:
-# try:
-#    with open('live_data.json', 'r') as f:
-#        live_data = json.load(f)
-#        st.session_state.ltp_data = live_data.get('ltp_cache', {})
-#        # Update other session states
-# except FileNotFoundError:
-#    pass
-# except json.JSONDecodeError:
-#    dashboard_logger.error("Error decoding live_data.json")
\ No newline at end of file
+    st.markdown("---")
+    st.header("Trade Status")
+
+    if st.session_state.trade_status:
+        trade_status_df = _trade_status_df(tuple(
+            (r.order_id, r.symbol, r.status, r.pnl, r.trailing_sl_target)
+            for r in st.session_state.trade_status.values()))
+        st.table(trade_status_df)
+    else:
+        st.info("No active trades.")
+
+    st.markdown("---")
+    st.header("Order History")
+
+    if not st.session_state.order_history.empty:
+        st.table(st.session_state.order_history)
+    else:
+        st.info("No order history yet.")
+
+
+live_data_panel()
+
+# Live LTPs and signals are pushed by main.py (see utils/dashboard_push.py); the shared
+# memory block (utils/shared_ltp.py) provides the snapshot on attach. Trades are still simulated.
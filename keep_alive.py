@@ -1,16 +1,33 @@
 # keep_alive.py
-from flask import Flask
+import asyncio
 from threading import Thread
 
-app = Flask(__name__)
+# The only route is '/', which always returns the same body, so the full response is prebuilt
+_BODY = b"GANGU PRO is live!"
+_RESPONSE = (b"HTTP/1.1 200 OK\r\n"
+             b"Content-Type: text/html; charset=utf-8\r\n"
+             b"Content-Length: " + str(len(_BODY)).encode() + b"\r\n"
+             b"Connection: close\r\n"
+             b"\r\n" + _BODY)
 
-@app.route('/')
-def home():
-    return "GANGU PRO is live!"
+async def handle(reader, writer):
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(_RESPONSE)
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
 
-def run():
+async def serve():
     # Using host='0.0.0.0' and port=8080 is standard for Replit web servers
-    app.run(host='0.0.0.0', port=8080)
+    server = await asyncio.start_server(handle, '0.0.0.0', 8080)
+    async with server:
+        await server.serve_forever()
+
+def run():
+    asyncio.run(serve())
 
 def keep_alive():
     t = Thread(target=run)
@@ -1,15 +1,21 @@
 import os
 import asyncio
 import logging
-from datetime import datetime, time, timedelta
-import pytz
+from datetime import datetime, time
+from time import time as epoch_now
+from zoneinfo import ZoneInfo
 from threading import Thread
-from flask import Flask
-import json
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+try:
+    import uvloop  # Faster event loop for the WebSocket/queue traffic; optional
+except ImportError:
+    uvloop = None
 
 # Fyers API imports (ensure fyers-api is installed via requirements.txt)
 try:
-    from fyers_api import fyersModel
+    from fyers_api import fyersModel, fyers_ws
     from fyers_api.fyers_ws import FyersSocket
 except ImportError:
     print(
@@ -18,10 +24,27 @@ except ImportError:
     print("You might need to run: pip install fyers-api")
     exit(1)
 
+from config import LTP_SHM_NAME, SHARED_LTP_SYMBOLS, DASHBOARD_PUSH_HOST, DASHBOARD_PUSH_PORT
+from config import DASHBOARD_REFRESH_SECONDS
+from config import FYERS_SDK_LOG_PATH, FYERS_DATA_LOG_LEVEL, APPLICATION_LOG
+from utils.shared_ltp import SharedLTPBuffer
+from utils.dashboard_push import DashboardPushServer
+from utils.records import CandleStore, LiveCandleTable
+from utils.fast_json import use_fast_json
+from utils.helpers import configure_root_logging
+
+# Let the Fyers SDK decode WebSocket frames / REST responses with orjson
+use_fast_json(fyersModel, fyers_ws)
+
 # --- Configuration & Global Variables ---
-# Configure logging
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging (queued, rotating root logger shared with the other modules)
+configure_root_logging(APPLICATION_LOG,
+                       fmt='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+# Only warnings and errors from the Fyers SDK's own loggers (the per-tick one is configurable)
+for _name in ("fyers_api", "FyersAPI"):
+    logging.getLogger(_name).setLevel(logging.WARNING)
+logging.getLogger("FyersWebsocket").setLevel(FYERS_DATA_LOG_LEVEL)
 
 # Load environment variables
 FYERS_APP_ID = os.environ.get('FYERS_APP_ID')
@@ -31,117 +54,222 @@ FYERS_SECRET_KEY = os.environ.get(
 
 # Ensure essential environment variables are set
 if not FYERS_APP_ID or not FYERS_ACCESS_TOKEN or not FYERS_SECRET_KEY:
-    logging.error(
+    logger.error(
         "Missing one or more Fyers environment variables (FYERS_APP_ID, FYERS_ACCESS_TOKEN, FYERS_SECRET_KEY). Please set them."
     )
     exit(1)
 else:
-    logging.info("Fyers environment variables loaded.")
-    logging.info("FYERS_ACCESS_TOKEN loaded from environment variable.")
+    logger.info("Fyers environment variables loaded.")
+    logger.info("FYERS_ACCESS_TOKEN loaded from environment variable.")
 
 # Global FyersModel instance
 fyers_rest_client = None
 
 # Global WebSocket client instance and data storage
 fyers_ws_client = None
-live_candles = {}  # Stores the latest 1-minute candle data for each symbol
-completed_candle_history = {
-}  # Stores completed 1-minute candles for SMA calculation
+# Subscribed symbols; per-symbol state below is indexed by position in this list
+SYMBOLS_TO_SUBSCRIBE = ['NSE:SBIN-EQ', 'NSE:RELIANCE-EQ']
+SYMBOL_IDS = {symbol: i for i, symbol in enumerate(SYMBOLS_TO_SUBSCRIBE)}
+live_candles = LiveCandleTable(len(
+    SYMBOLS_TO_SUBSCRIBE))  # Latest 1-minute candle per symbol id
+completed_candle_history = [
+]  # Per-symbol-id CandleStore of completed 1-minute candles for SMA calculation
+_candle_appenders = []  # Bound CandleStore.append per symbol id (set in main())
+# Candles whose minute has ended, queued by onmessage as (symbol id, LiveCandle)
+# and processed by main() (created in main(), with the loop it belongs to)
+close_queue = None
+main_loop = None
 CANDLE_HISTORY_LIMIT = 200  # Number of 1-minute candles to keep for SMA calculation
 SMA_FAST_PERIOD = 9
 SMA_SLOW_PERIOD = 21
+# Seconds after a minute ends before candles without a tick in the new minute are
+# closed by main() (ticks of the new minute usually close them first)
+CANDLE_CLOSE_GRACE_SECONDS = 2
+
+_UTC = ZoneInfo('UTC')  # Only used to format candle times for logging
+
+# Shared memory LTP table read by the dashboard (created in main())
+shared_ltp = None
+# WebSocket server pushing LTP/signal changes to the dashboard (started in main())
+dashboard_push = DashboardPushServer(DASHBOARD_PUSH_HOST, DASHBOARD_PUSH_PORT)
+# Latest LTP per symbol, written by the WebSocket thread and pushed on change by push_ltps()
+latest_ltps = {}
 
-# --- Flask Keep-Alive Server ---
-app = Flask(__name__)
+# --- Keep-Alive Server ---
+_KEEP_ALIVE_BODY = b"Fyers Trading Bot is running and keeping connection alive!"
 
 
-@app.route('/')
-def home():
-    return "Fyers Trading Bot is running and keeping connection alive!"
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a fixed body; only used as a health check."""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(_KEEP_ALIVE_BODY)))
+        self.end_headers()
+        self.wfile.write(_KEEP_ALIVE_BODY)
+
+    def log_message(self, format, *args):
+        pass  # Don't log every health check request
 
 
 def run_keep_alive():
-    logging.info("Keep-alive web server started.")
-    app.run(host='0.0.0.0', port=8080, debug=False)
+    logger.info("Keep-alive web server started.")
+    HTTPServer(('0.0.0.0', 8080), KeepAliveHandler).serve_forever()
 
 
 # --- Fyers WebSocket Callbacks ---
 
 
-def onmessage(message):
-    global live_candles
-    # logging.info(f"Raw WebSocket Message: {message}") # Uncomment for raw message debugging
+def _handle_data_frame(message):
+    """Updates the live candle of every subscribed symbol in a 'df' message."""
+    # Resolve globals/bound methods once per message rather than per candle
+    symbol_id = SYMBOL_IDS.get
+    candles = live_candles
+    ts, opens, highs = candles.ts, candles.open, candles.high
+    lows, closes = candles.low, candles.close
+    volumes, day_volumes = candles.volume, candles.cumulative_day_volume
+    queue, loop, ltp_table = close_queue, main_loop, shared_ltp
+    ltps = latest_ltps
+    for candle_data in message.get('v', ()):
+        get = candle_data.get
+        symbol = get('symbol')
+        sid = symbol_id(symbol)
+        if sid is None:
+            continue
+        # Fyers provides timestamp in epoch seconds; epoch seconds are
+        # timezone independent, so they are kept as an int (no datetime per tick)
+        timestamp_ist_epoch = get('timestamp')
+        if not timestamp_ist_epoch:
+            continue
+        timestamp_ist_epoch = int(timestamp_ist_epoch)
+        close = get('close')
+
+        # A tick from a later minute closes the previous candle
+        prev_ts = ts[sid]
+        if (prev_ts and queue is not None
+                and timestamp_ist_epoch // 60 > prev_ts // 60):
+            loop.call_soon_threadsafe(queue.put_nowait,
+                                      (sid, candles.snapshot(sid)))
+        # Update the latest 1-minute candle in place (missing fields stored as 0)
+        ts[sid] = timestamp_ist_epoch
+        opens[sid] = get('open') or 0
+        highs[sid] = get('high') or 0
+        lows[sid] = get('low') or 0
+        closes[sid] = close or 0
+        volumes[sid] = get('vol') or 0
+        day_volumes[sid] = get(
+            'short_mkt_qty') or 0  # For cumulative day volume
+        # logger.info("Updated live candle for %s: %s", symbol, live_candles.snapshot(sid)) # Uncomment to see live candle updates
+
+        if close is not None:
+            if ltp_table is not None:
+                ltp_table.write(symbol, close, timestamp_ist_epoch)
+            ltps[symbol] = close
+
+
+async def push_ltps():
+    """
+    Pushes the LTPs that changed since the last push to the dashboard, once per
+    DASHBOARD_REFRESH_SECONDS, instead of one push per tick.
+    """
+    sent = {}
+    while True:
+        await asyncio.sleep(DASHBOARD_REFRESH_SECONDS)
+        # dict() copies atomically under the GIL while the WebSocket thread keeps writing
+        changed = {
+            symbol: ltp
+            for symbol, ltp in dict(latest_ltps).items()
+            if sent.get(symbol) != ltp
+        }
+        if changed:
+            sent.update(changed)
+            dashboard_push.publish({"ltp": changed})
+
+
+def _ended_live_candles(before_minute):
+    """
+    Yields (symbol id, LiveCandle) for each live candle from a minute (epoch // 60)
+    before before_minute, i.e. candles no tick of a later minute has closed yet.
+    """
+    ts = live_candles.ts
+    for sid in range(len(ts)):
+        candle_ts = int(ts[sid])
+        if candle_ts and candle_ts // 60 < before_minute:
+            candle = live_candles.snapshot(sid)
+            # The WebSocket thread writes ts first; if it changed, it has queued this candle itself
+            if ts[sid] == candle_ts:
+                yield sid, candle
+
+
+def _log_from_main_loop(level, msg, *args):
+    """Logs on the main event loop so the WebSocket thread never waits on log I/O."""
+    if main_loop is not None:
+        main_loop.call_soon_threadsafe(logger.log, level, msg, *args)
+    else:
+        logger.log(level, msg, *args)
+
+
+def _handle_error_message(message):
+    _log_from_main_loop(logging.ERROR, "WebSocket Error Message: %s",
+                        message.get('msg'))
+
+
+def _handle_order_update(message):
+    _log_from_main_loop(logging.INFO, "Order Update: %s", message)
+
+
+def _handle_order_status(message):
+    _log_from_main_loop(logging.INFO, "Order Status: %s", message)
+
+
+# WebSocket message type ('t') -> handler
+_MESSAGE_HANDLERS = {
+    'df': _handle_data_frame,  # Data frame message
+    'error': _handle_error_message,
+    'order_update': _handle_order_update,
+    'order_status': _handle_order_status,
+}
+
 
+def onmessage(message):
+    # logger.info("Raw WebSocket Message: %s", message) # Uncomment for raw message debugging
     if isinstance(message, dict):
-        if message.get('t') == 'df':  # Data frame message
-            for candle_data in message.get('v', []):
-                symbol = candle_data.get('symbol')
-                if symbol:
-                    # Convert timestamp to IST/UTC datetime object
-                    # Fyers provides timestamp in epoch seconds (IST)
-                    timestamp_ist_epoch = candle_data.get('timestamp')
-                    if timestamp_ist_epoch:
-                        timestamp_utc = datetime.fromtimestamp(
-                            timestamp_ist_epoch,
-                            tz=pytz.timezone('Asia/Kolkata')).astimezone(
-                                pytz.utc)
-
-                        # Update the latest 1-minute candle
-                        live_candles[symbol] = {
-                            'timestamp':
-                            timestamp_utc,
-                            'open':
-                            candle_data.get('open'),
-                            'high':
-                            candle_data.get('high'),
-                            'low':
-                            candle_data.get('low'),
-                            'close':
-                            candle_data.get('close'),
-                            'volume':
-                            candle_data.get('vol'),
-                            'cumulative_day_volume':
-                            candle_data.get(
-                                'short_mkt_qty')  # For cumulative day volume
-                        }
-                        # logging.info(f"Updated live candle for {symbol}: {live_candles[symbol]}") # Uncomment to see live candle updates
-        elif message.get('t') == 'error':
-            logging.error(f"WebSocket Error Message: {message.get('msg')}")
-        elif message.get('t') == 'order_update':
-            logging.info(f"Order Update: {message}")
-        elif message.get('t') == 'order_status':
-            logging.info(f"Order Status: {message}")
+        handler = _MESSAGE_HANDLERS.get(message.get('t'))
+        if handler is not None:
+            handler(message)
         else:
-            logging.info(f"Received WebSocket data: {message}")
+            _log_from_main_loop(logging.INFO, "Received WebSocket data: %s",
+                                message)
     else:
-        logging.warning(
-            f"Unexpected message type from WebSocket: {type(message)} - {message}"
-        )
+        _log_from_main_loop(logging.WARNING,
+                            "Unexpected message type from WebSocket: %s - %s",
+                            type(message), message)
 
 
 def onerror(message):
-    logging.error(f"WebSocket Error: {message}")
+    logger.error("WebSocket Error: %s", message)
 
 
 def onopen():
-    logging.info("Websocket connected")
+    logger.info("Websocket connected")
     # Subscribing to market data for SBIN and RELIANCE
     data_type = "symbolData"  # "symbolData" for 1-minute candle, "depth" for market depth etc.
-    symbols_to_subscribe = ['NSE:SBIN-EQ', 'NSE:RELIANCE-EQ']
+    symbols_to_subscribe = SYMBOLS_TO_SUBSCRIBE
     # If you want to use the 'token' based format for WebSocket (recommended by Fyers)
     # The format is 'token':'1,2,3...' where 1,2,3 are Fyers instrument tokens
     # You'll need to fetch instrument tokens via Fyers API first or hardcode them
     # For now, let's assume direct symbol string works for symbolData, if not use tokens
     # The `fyers-api` library often handles token conversion internally for subscribe with symbol strings.
-    logging.info(
-        f"WebSocket connection established. Subscribing to instruments...")
+    logger.info(
+        "WebSocket connection established. Subscribing to instruments...")
     fyers_ws_client.subscribe(symbols=symbols_to_subscribe,
                               data_type=data_type)
-    logging.info(f"Subscribed to: {symbols_to_subscribe} for {data_type}.")
+    logger.info("Subscribed to: %s for %s.", symbols_to_subscribe, data_type)
 
 
 def onclose():
-    logging.info("Websocket connection closed.")
+    logger.info("Websocket connection closed.")
 
 
 # --- Fyers API Initialization ---
@@ -153,20 +281,20 @@ def authenticate_fyers(app_id, secret_key, access_token):
         fyers = fyersModel.FyersModel(
             client_id=app_id,
             token=access_token,
-            log_path=os.getcwd()  # Log path set to current working directory
+            log_path=FYERS_SDK_LOG_PATH  # tmpfs, see config.py
         )
-        logging.info(
+        logger.info(
             "Access Token obtained. Testing REST API (profile fetch)...")
         profile = fyers.get_profile()
         if profile and profile.get('s') == 'ok':
-            logging.info("Successfully fetched user profile via REST API.")
+            logger.info("Successfully fetched user profile via REST API.")
             return fyers
         else:
-            logging.error(f"Failed to fetch user profile: {profile}")
+            logger.error("Failed to fetch user profile: %s", profile)
             return None
     except Exception as e:
-        logging.error(
-            f"Error during Fyers authentication or profile fetch: {e}")
+        logger.error(
+            "Error during Fyers authentication or profile fetch: %s", e)
         return None
 
 
@@ -178,130 +306,122 @@ def initialize_fyers_client(access_token):
         # This is where your actual access token from the login flow or env var goes
         # For direct use from env var, ensure it's the complete token
         ws_token = f"{FYERS_APP_ID}:{access_token}"
-        logging.info(
-            f"Using WebSocket token format: {FYERS_APP_ID}:<your_token_starts_here...> (masked for security)"
-        )
+        logger.info(
+            "Using WebSocket token format: %s:<your_token_starts_here...> (masked for security)",
+            FYERS_APP_ID)
 
         data_socket = FyersSocket(
             access_token=ws_token,
-            log_path=os.getcwd(),
+            log_path=FYERS_SDK_LOG_PATH,
             litemode=False,  # Set to True for Lite mode (only LTP)
             write_to_file=False,
             handler_message=onmessage,
             handler_error=onerror,
             handler_open=onopen,
             handler_close=onclose)
-        logging.info("Connecting to Fyers WebSocket...")
+        logger.info("Connecting to Fyers WebSocket...")
         # Run the WebSocket connection in a separate thread to not block the main async loop
         Thread(target=data_socket.connect).start()
         return data_socket
     except Exception as e:
-        logging.error(f"Error initializing Fyers WebSocket client: {e}")
+        logger.error("Error initializing Fyers WebSocket client: %s", e)
         return None
 
 
 # --- Trading Logic (SMA Crossover) ---
 
 
-def calculate_sma(data, period):
-    """Calculates Simple Moving Average."""
-    if len(data) < period:
-        return None
-    return sum(c['close'] for c in data[-period:]) / period
-
-
-def check_sma_crossover(symbol):
-    """Checks for SMA crossover signals."""
-    history = completed_candle_history.get(symbol)
-    if not history or len(history) < SMA_SLOW_PERIOD:
+def check_sma_crossover(symbol_id):
+    """Checks for SMA crossover signals for the symbol at index symbol_id."""
+    history = completed_candle_history[symbol_id]
+    # Need the previous candle's SMAs too, so one more close than the slow period
+    if history.count < SMA_SLOW_PERIOD + 1:
         return None
+    symbol = SYMBOLS_TO_SUBSCRIBE[symbol_id]
 
-    fast_sma = calculate_sma(history, SMA_FAST_PERIOD)
-    slow_sma = calculate_sma(history, SMA_SLOW_PERIOD)
-
-    if fast_sma is None or slow_sma is None:
-        return None
-
-    # Get previous SMAs for crossover check
-    # Need at least two data points to check crossover
-    if len(
-            history
-    ) < SMA_SLOW_PERIOD + 1:  # Need previous candle for previous SMA calculation
-        return None
-
-    prev_history = history[:
-                           -1]  # History excluding the very last (current) candle
-    prev_fast_sma = calculate_sma(prev_history, SMA_FAST_PERIOD)
-    prev_slow_sma = calculate_sma(prev_history, SMA_SLOW_PERIOD)
-
-    if prev_fast_sma is None or prev_slow_sma is None:
-        return None
+    fast_sma = history.fast_sum / SMA_FAST_PERIOD
+    slow_sma = history.slow_sum / SMA_SLOW_PERIOD
+    prev_fast_sma = history.prev_fast_sum / SMA_FAST_PERIOD
+    prev_slow_sma = history.prev_slow_sum / SMA_SLOW_PERIOD
 
     if fast_sma > slow_sma and prev_fast_sma <= prev_slow_sma:
-        logging.info(
-            f"STRATEGY SIGNAL for {symbol}: BUY (Fast SMA crossed above Slow SMA)"
-        )
+        logger.info(
+            "STRATEGY SIGNAL for %s: BUY (Fast SMA crossed above Slow SMA)",
+            symbol)
         return "BUY"
     elif fast_sma < slow_sma and prev_fast_sma >= prev_slow_sma:
-        logging.info(
-            f"STRATEGY SIGNAL for {symbol}: SELL (Fast SMA crossed below Slow SMA)"
-        )
+        logger.info(
+            "STRATEGY SIGNAL for %s: SELL (Fast SMA crossed below Slow SMA)",
+            symbol)
         return "SELL"
     return None
 
 
-def execute_trade(symbol, signal, price):
+# Example: Place a market order
+# Replace with your actual order parameters (e.g., quantity, product_type, order_type)
+# Built once; execute_trade fills in symbol and side per trade
+_ORDER_TEMPLATE = {
+    "symbol": None,
+    "qty": 1,  # Example quantity
+    "type":
+    2,  # 1: Limit Order, 2: Market Order, 3: Stop Order, 4: Stop Limit Order
+    "side": 0,  # 1: Buy, -1: Sell
+    "productType": "INTRADAY",  # INTRADAY, CNC, MARGIN, CO, BO
+    "limitPrice": 0,
+    "stopPrice": 0,
+    "validity": "DAY",  # DAY, IOC
+    "disclosedQty": 0,
+    "offlineOrder": False,
+    "orderTag": "my_algo_trade"  # Optional tag
+}
+
+
+async def execute_trade(symbol, signal, price):
     """
     Executes a trade based on the signal.
     This is a placeholder. You need to implement actual order placement using fyers_rest_client.
+    The blocking place_order call runs in a worker thread so the event loop keeps serving
+    the close queue, dashboard pushes and WebSocket log handoffs meanwhile.
     """
     if not fyers_rest_client:
-        logging.error(
+        logger.error(
             "Fyers REST client not initialized. Cannot execute trade.")
         return
 
-    # Example: Place a market order
-    # Replace with your actual order parameters (e.g., quantity, product_type, order_type)
-    order_params = {
-        "symbol": symbol,
-        "qty": 1,  # Example quantity
-        "type":
-        2,  # 1: Limit Order, 2: Market Order, 3: Stop Order, 4: Stop Limit Order
-        "side": 1 if signal == "BUY" else -1,  # 1: Buy, -1: Sell
-        "productType": "INTRADAY",  # INTRADAY, CNC, MARGIN, CO, BO
-        "limitPrice": 0,
-        "stopPrice": 0,
-        "validity": "DAY",  # DAY, IOC
-        "disclosedQty": 0,
-        "offlineOrder": False,
-        "orderTag": "my_algo_trade"  # Optional tag
-    }
+    # Copy the template: the payload is used on a worker thread, and another
+    # trade may fill in its own symbol/side while this one is in flight
+    order_params = dict(_ORDER_TEMPLATE)
+    order_params["symbol"] = symbol
+    order_params["side"] = 1 if signal == "BUY" else -1  # 1: Buy, -1: Sell
 
     try:
-        logging.info(
-            f"Attempting to place {signal} order for {symbol} at price {price}..."
-        )
-        response = fyers_rest_client.place_order(data=order_params)
+        logger.info(
+            "Attempting to place %s order for %s at price %s...", signal,
+            symbol, price)
+        response = await asyncio.to_thread(fyers_rest_client.place_order,
+                                           data=order_params)
         if response and response.get('s') == 'ok':
             order_id = response.get('id')
-            logging.info(
-                f"Successfully placed {signal} order for {symbol}. Order ID: {order_id}"
-            )
-            logging.info(f"Order response: {response}")
+            logger.info(
+                "Successfully placed %s order for %s. Order ID: %s", signal,
+                symbol, order_id)
+            logger.info("Order response: %s", response)
         else:
-            logging.error(
-                f"Failed to place {signal} order for {symbol}: {response}")
+            logger.error(
+                "Failed to place %s order for %s: %s", signal, symbol,
+                response)
     except Exception as e:
-        logging.error(f"Error placing order for {symbol}: {e}")
+        logger.error("Error placing order for %s: %s", symbol, e)
 
 
 # --- Main Bot Logic ---
 
 
 async def main():
-    global fyers_rest_client, fyers_ws_client, live_candles, completed_candle_history
+    global fyers_rest_client, fyers_ws_client, completed_candle_history, shared_ltp
+    global close_queue, main_loop
 
-    # Start the Flask keep-alive server in a separate thread
+    # Start the keep-alive server in a separate thread
     keep_alive_thread = Thread(target=run_keep_alive)
     keep_alive_thread.daemon = True  # Daemonize thread so it exits when main program exits
     keep_alive_thread.start()
@@ -310,95 +430,145 @@ async def main():
     fyers_rest_client = authenticate_fyers(FYERS_APP_ID, FYERS_SECRET_KEY,
                                            FYERS_ACCESS_TOKEN)
     if not fyers_rest_client:
-        logging.error("Failed to initialize Fyers REST client. Exiting.")
+        logger.error("Failed to initialize Fyers REST client. Exiting.")
         return
 
+    # Push LTP/signal changes to the dashboard
+    ltp_push_task = None
+    try:
+        await dashboard_push.start()
+        ltp_push_task = asyncio.create_task(push_ltps())
+    except OSError as e:
+        logger.warning("Could not start dashboard push server: %s", e)
+
+    # Publish LTPs to the dashboard via shared memory
+    try:
+        shared_ltp = SharedLTPBuffer(SHARED_LTP_SYMBOLS,
+                                     LTP_SHM_NAME,
+                                     create=True)
+    except Exception as e:
+        logger.warning(
+            "Could not create shared LTP memory. Dashboard will not get live prices: %s",
+            e)
+
+    # Closed candles are handed over from the WebSocket thread via this queue
+    main_loop = asyncio.get_running_loop()
+    close_queue = asyncio.Queue()
+
     # Initialize Fyers WebSocket client
     fyers_ws_client = initialize_fyers_client(FYERS_ACCESS_TOKEN)
     if not fyers_ws_client:
-        logging.error("Failed to initialize Fyers WebSocket client. Exiting.")
+        logger.error("Failed to initialize Fyers WebSocket client. Exiting.")
         return
 
     # Initialize candle history for subscribed symbols
-    symbols_to_subscribe = ['NSE:SBIN-EQ', 'NSE:RELIANCE-EQ']
-    for symbol in symbols_to_subscribe:
-        completed_candle_history[symbol] = []
-        live_candles[symbol] = {
-        }  # Initialize empty live candle for each symbol
+    completed_candle_history = [
+        CandleStore(CANDLE_HISTORY_LIMIT, SMA_FAST_PERIOD, SMA_SLOW_PERIOD)
+        for _ in SYMBOLS_TO_SUBSCRIBE
+    ]
+    _candle_appenders[:] = [store.append for store in completed_candle_history]
 
     # Define market hours in UTC (IST is UTC + 5:30)
     # 9:15 AM IST = 3:45 AM UTC
     # 3:30 PM IST = 10:00 AM UTC
     market_open_time_utc = time(3, 45, 0)
     market_close_time_utc = time(10, 0, 0)
-
-    last_minute_checked = None
-
+    # Today's session as epoch seconds (epoch days are exactly 86400s in UTC)
+    now = epoch_now()
+    day_start = int(now) // 86400 * 86400
+    market_open_epoch = day_start + market_open_time_utc.hour * 3600 + market_open_time_utc.minute * 60
+    market_close_epoch = day_start + market_close_time_utc.hour * 3600 + market_close_time_utc.minute * 60
+
+    if now < market_open_epoch:
+        logger.info(
+            "Market not yet open. Current UTC time: %s. Waiting for market open (UTC %s).",
+            datetime.fromtimestamp(now, tz=_UTC).strftime('%H:%M:%S'),
+            market_open_time_utc.strftime('%H:%M'))
+        await asyncio.sleep(market_open_epoch - now)
+
+    # Last minute (epoch // 60) processed per symbol id: a candle can be closed both by
+    # onmessage (a tick from a later minute) and by the timer below, but is processed once
+    closed_minutes = [0] * len(SYMBOLS_TO_SUBSCRIBE)
+
+    async def close_candle(sid, candle):
+        minute = candle.ts_epoch // 60
+        if minute <= closed_minutes[sid]:
+            return
+        closed_minutes[sid] = minute
+        symbol = SYMBOLS_TO_SUBSCRIBE[sid]
+
+        if logger.isEnabledFor(logging.INFO):
+            candle_time = datetime.fromtimestamp(
+                candle.ts_epoch, tz=_UTC).strftime('%Y-%m-%d %H:%M')
+            logger.info(
+                "1-Minute Candle CLOSED for %s: Time=%s, O=%s, H=%s, L=%s, C=%s, DailyVol=%s",
+                symbol, candle_time, candle.open, candle.high, candle.low,
+                candle.close, candle.cumulative_day_volume)
+
+        _candle_appenders[sid](candle.ts_epoch, candle.open, candle.high,
+                               candle.low, candle.close, candle.volume)
+
+        signal = check_sma_crossover(sid)
+        if signal:
+            # Execute the trade when a signal is generated
+            current_price_for_trade = candle.close
+            dashboard_push.publish({
+                "signals": {
+                    symbol: {
+                        "signal_type": signal,
+                        "price": current_price_for_trade,
+                        "strategy": "SMA Crossover",
+                        "time": datetime.now(_UTC).strftime("%H:%M:%S")
+                    }
+                }
+            })
+            await execute_trade(symbol, signal, current_price_for_trade)
+
+    # Process closed candles until market close. Candles of symbols that get no tick
+    # in the next minute are closed by a timer shortly after each minute ends.
+    next_flush = (int(epoch_now()) // 60 + 1) * 60 + CANDLE_CLOSE_GRACE_SECONDS
     while True:
-        current_datetime_utc = datetime.utcnow()
-        current_time_utc = current_datetime_utc.time()
-
-        # Check if within market hours to process candles and trade
-        if market_open_time_utc <= current_time_utc < market_close_time_utc:
-            current_minute_start = current_datetime_utc.replace(second=0,
-                                                                microsecond=0)
-
-            if last_minute_checked is None or current_minute_start > last_minute_checked:
-                for symbol in list(live_candles.keys()):
-                    candle = live_candles.get(
-                        symbol
-                    )  # Use .get to avoid KeyError if symbol not yet updated
-                    if not candle: continue  # Skip if no live candle data yet
-
-                    candle_ts_utc_start = candle["timestamp"].replace(
-                        second=0, microsecond=0)
-
-                    # Process only if the candle timestamp is for a past minute
-                    if candle_ts_utc_start < current_minute_start:
-                        logging.info(
-                            f"1-Minute Candle CLOSED for {symbol}: "
-                            f"Time={candle['timestamp'].strftime('%Y-%m-%d %H:%M')}, "
-                            f"O={candle['open']}, H={candle['high']}, "
-                            f"L={candle['low']}, C={candle['close']}, "
-                            f"DailyVol={candle['cumulative_day_volume']}")
-
-                        completed_candle_history[symbol].append(candle.copy())
-
-                        if len(completed_candle_history[symbol]
-                               ) > CANDLE_HISTORY_LIMIT:
-                            completed_candle_history[symbol].pop(0)
-
-                        signal = check_sma_crossover(symbol)
-                        if signal:
-                            # Execute the trade when a signal is generated
-                            current_price_for_trade = candle['close']
-                            execute_trade(symbol, signal,
-                                          current_price_for_trade)
-
-                last_minute_checked = current_minute_start
-
-            await asyncio.sleep(0.5)
-            # Poll more frequently within market hours
-
-        elif current_time_utc >= market_close_time_utc:
-            logging.info(
-                f"Market close time ({market_close_time_utc.strftime('%H:%M')} UTC) reached. Exiting system."
-            )
-            # No explicit close needed for fyers_ws_client as program termination handles it.
-            break  # Exit the loop and end the program after market close
-
-        else:  # Before market open
-            logging.info(
-                f"Market not yet open. Current UTC time: {current_time_utc.strftime('%H:%M:%S')}. Waiting for market open (UTC {market_open_time_utc.strftime('%H:%M')})."
-            )
-            await asyncio.sleep(60)  # Sleep longer if market is closed
+        now = epoch_now()
+        remaining = market_close_epoch - now
+        if remaining <= 0:
+            break
+        if now >= next_flush:
+            for sid, candle in _ended_live_candles(int(now) // 60):
+                await close_candle(sid, candle)
+            next_flush = (int(now) // 60 + 1) * 60 + CANDLE_CLOSE_GRACE_SECONDS
+            continue
+        # Sleep until onmessage reports a closed candle, the next flush or market close
+        try:
+            sid, candle = await asyncio.wait_for(
+                close_queue.get(), timeout=min(remaining, next_flush - now))
+        except asyncio.TimeoutError:
+            continue
+        await close_candle(sid, candle)
+
+    # Market close: process what is queued, then every candle still open
+    while not close_queue.empty():
+        await close_candle(*close_queue.get_nowait())
+    for sid, candle in _ended_live_candles(market_close_epoch // 60 + 1):
+        await close_candle(sid, candle)
+
+    logger.info(
+        "Market close time (%s UTC) reached. Exiting system.",
+        market_close_time_utc.strftime('%H:%M'))
+    if ltp_push_task is not None:
+        ltp_push_task.cancel()
+    # No explicit close needed for fyers_ws_client as program termination handles it.
 
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        logging.info("Bot stopped manually.")
+        logger.info("Bot stopped manually.")
     except Exception as e:
-        logging.critical(f"An unhandled error occurred: {e}", exc_info=True)
+        logger.critical("An unhandled error occurred: %s", e, exc_info=True)
+    finally:
+        if shared_ltp is not None:
+            shared_ltp.close()
@@ -1,70 +1,165 @@
+import time
+import asyncio
 import logging
 from fyers_apiv3.FyersAPI import FyersAPI
 from fyers_apiv3.exceptions import exceptions
-from config import TRADE_QUANTITY, PRODUCT_TYPE, ORDER_TYPE, LIMIT_PRICE_BUFFER
+from config import FYERS_APP_ID, TRADE_QUANTITY, PRODUCT_TYPE, ORDER_TYPE, LIMIT_PRICE_BUFFER
+from config import TOKEN_REFRESH_MARGIN_SECONDS
+
+try:
+    import aiohttp  # Non-blocking REST calls; falls back to the blocking SDK in a thread
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+# Fyers v3 REST endpoints used by the aiohttp client
+FYERS_API_BASE_URL = "https://api-t1.fyers.in/api/v3"
+FYERS_ORDERS_URL = f"{FYERS_API_BASE_URL}/orders/sync"
+FYERS_ORDERBOOK_URL = f"{FYERS_API_BASE_URL}/orders"
+
+# --- Order payload builders, one per order type ---
+# Each returns the complete payload with only the prices that order type uses.
+
+def _build_market(symbol, side_value, qty, price):
+    return {"symbol": symbol, "qty": qty, "type": 1, "side": side_value, "productType": PRODUCT_TYPE,
+            "limitPrice": 0, "stopPrice": 0, "disclosedQty": 0, "validity": "DAY", "offlineOrder": False}
+
+def _build_limit(symbol, side_value, qty, price):
+    return {"symbol": symbol, "qty": qty, "type": 2, "side": side_value, "productType": PRODUCT_TYPE,
+            "limitPrice": price, "stopPrice": 0, "disclosedQty": 0, "validity": "DAY", "offlineOrder": False}
+
+def _build_stop(symbol, side_value, qty, price):
+    return {"symbol": symbol, "qty": qty, "type": 3, "side": side_value, "productType": PRODUCT_TYPE,
+            "limitPrice": 0, "stopPrice": price, "disclosedQty": 0, "validity": "DAY", "offlineOrder": False}
+
+def _build_stop_limit(symbol, side_value, qty, price):
+    return {"symbol": symbol, "qty": qty, "type": 4, "side": side_value, "productType": PRODUCT_TYPE,
+            "limitPrice": price, "stopPrice": price, "disclosedQty": 0, "validity": "DAY", "offlineOrder": False}
+
+# order_type: 1 for MARKET, 2 for LIMIT, 3 for STOP (SL-M), 4 for STOP_LIMIT (SL-L)
+_BUILDERS = {1: _build_market, 2: _build_limit, 3: _build_stop, 4: _build_stop_limit}
+
+# Order types that need a non-zero price, with the error reported when it is missing
+_PRICE_REQUIRED = {
+    2: "Limit order requires a price.",
+    3: "Stop order requires a trigger price.",
+    4: "Stop-Limit order requires both limitPrice and stopPrice.",
+}
+
+# Order book statuses that never change again: 1 Cancelled, 2 Traded/Filled, 5 Rejected, 7 Expired
+_TERMINAL_ORDER_STATUSES = frozenset((1, 2, 5, 7))
+
 class FyersTradeHandler:
-    def __init__(self, fyers_api_instance: FyersAPI, telegram_sender_func):
+    def __init__(self, fyers_api_instance: FyersAPI, telegram_sender_func, ensure_fresh_token=None, token_exp: float = 0.0,
+                 access_token: str = None):
+        """
+        :param ensure_fresh_token: Optional async callable returning (access token, expiry in epoch seconds)
+                                   for a token that is not about to expire (e.g., auth.refresh_fyers_access_token)
+        :param token_exp: Expiry (epoch seconds) of the current access token, 0 if unknown
+        :param access_token: If given (and aiohttp is installed), orders go through a persistent
+                             aiohttp session instead of the blocking SDK
+        """
         self.fyers = fyers_api_instance
         self.telegram_sender = telegram_sender_func
+        self.ensure_fresh_token = ensure_fresh_token
+        self._token_exp = token_exp
+        self.access_token = access_token
+        self._session = None # Created lazily, it must be bound to the running event loop
+        self._orders = {} # Latest known state of each order, keyed by order ID
+        self._order_feed = False # True once on_order_update receives pushed updates, keeping _orders current
 
-    async def place_order(self, symbol: str, side: str, qty: int, order_type: int, price: float = 0.0):
+    def update_access_token(self, access_token: str, token_exp: float = 0.0):
+        """Switches the REST session and the SDK client to a new access token (e.g., after a refresh)."""
+        self.access_token = access_token
+        self._token_exp = token_exp
+        authorization = f"{FYERS_APP_ID}:{access_token}"
+        if self._session is not None:
+            self._session.headers["Authorization"] = authorization
+        if self.fyers is not None:
+            # FyersModel sends its "client_id:token" header attribute with every request
+            self.fyers.token = access_token
+            self.fyers.header = authorization
+
+    def _get_session(self):
+        """Returns the shared aiohttp session, or None to use the SDK."""
+        if aiohttp is None or not self.access_token:
+            return None
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers={"Authorization": f"{FYERS_APP_ID}:{self.access_token}"})
+        return self._session
+
+    async def _request(self, method: str, url: str, payload: dict = None, sdk_call=None):
         """
-        Places an order with Fyers.
-        :param symbol: Fyers instrument symbol (e.g., "NSE:NIFTY50-INDEX")
-        :param side: "BUY" or "SELL"
-        :param qty: Quantity to trade
-        :param order_type: 1 for MARKET, 2 for LIMIT, 3 for STOP, 4 for STOP_LIMIT
-        :param price: Required for LIMIT/STOP_LIMIT orders
+        Calls a Fyers REST endpoint without blocking the event loop.
+        Uses the aiohttp session when available, otherwise runs sdk_call(data=payload) in a thread.
         """
-        if not self.fyers:
-            await self.telegram_sender(f"Order placement failed for {symbol}: Fyers API not initialized.")
-            logger.error(f"Order placement failed for {symbol}: Fyers API not initialized.")
-            return None
+        session = self._get_session()
+        if session is None:
+            if payload is None:
+                return await asyncio.to_thread(sdk_call)
+            return await asyncio.to_thread(sdk_call, data=payload)
+        async with session.request(method, url, json=payload) as r:
+            try:
+                response = await r.json(loads=_json_loads, content_type=None)
+            except ValueError:
+                response = None
+            if r.status >= 400:
+                # Same error path as the SDK, which raises for HTTP errors
+                message = response.get("message") if isinstance(response, dict) else None
+                raise exceptions.FyersAPIError(f"HTTP {r.status}: {message or r.reason}")
+            return response
 
-        side_value = 1 if side.upper() == "BUY" else -1
-        
-        # Construct order payload
-        order_payload = {
-            "symbol": symbol,
-            "qty": qty,
-            "type": order_type,
-            "side": side_value,
-            "productType": PRODUCT_TYPE,
-            "limitPrice": price if order_type in [2, 4] else 0,
-            "stopPrice": price if order_type in [3, 4] else 0,
-            "disclosedQty": 0,
-            "validity": "DAY",
-            "offlineOrder": False,
-        }
-
-        # For market orders, ensure limitPrice and stopPrice are 0
-        if order_type == 1: # Market order
-            order_payload["limitPrice"] = 0
-            order_payload["stopPrice"] = 0
-        elif order_type == 2: # Limit order
-            if price == 0:
-                logger.error(f"Limit order for {symbol} requires a price.")
-                await self.telegram_sender(f"Order failed for {symbol}: Limit order requires a price.")
-                return None
-            order_payload["stopPrice"] = 0
-        elif order_type == 3: # Stop order (SL-M)
-             if price == 0:
-                logger.error(f"Stop order for {symbol} requires a trigger price.")
-                await self.telegram_sender(f"Order failed for {symbol}: Stop order requires a trigger price.")
-                return None
-             order_payload["limitPrice"] = 0
-        elif order_type == 4: # Stop-Limit order (SL-L)
-             if price == 0 or order_payload["stopPrice"] == 0:
-                logger.error(f"Stop-Limit order for {symbol} requires both limitPrice and stopPrice.")
-                await self.telegram_sender(f"Order failed for {symbol}: Stop-Limit order requires both limitPrice and stopPrice.")
-                return None
+    async def close(self):
+        """Closes the REST session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _refresh_token_if_expiring(self):
+        """Refreshes the access token before it expires instead of waiting for a rejected request."""
+        if self.ensure_fresh_token and self._token_exp and time.time() > self._token_exp - TOKEN_REFRESH_MARGIN_SECONDS:
+            logger.info("Access token is about to expire. Refreshing before placing order.")
+            try:
+                access_token, token_exp = await self.ensure_fresh_token()
+            except Exception as e:
+                access_token, token_exp = None, 0.0
+                logger.exception("Access token refresh failed: %s", e)
+            if not access_token:
+                # Orders still go out with the current token, which may be rejected once it expires
+                logger.error("Could not refresh the access token; placing orders with the current one.")
+                await self.telegram_sender("⚠️ Fyers access token refresh failed. Orders may be rejected until you log in again.")
+                return
+            self.update_access_token(access_token, token_exp or 0.0)
 
+    async def _build_payload(self, symbol: str, side: str, qty: int, order_type: int, price: float = 0.0):
+        """
+        Validates the order parameters and builds the Fyers order payload.
+        Returns None (after alerting) if the parameters are invalid.
+        """
+        builder = _BUILDERS.get(order_type)
+        if builder is None:
+            logger.error("Unsupported order type %s for %s.", order_type, symbol)
+            await self.telegram_sender(f"Order failed for {symbol}: Unsupported order type {order_type}.")
+            return None
+        if price == 0 and order_type in _PRICE_REQUIRED:
+            logger.error("%s (%s)", _PRICE_REQUIRED[order_type], symbol)
+            await self.telegram_sender(f"Order failed for {symbol}: {_PRICE_REQUIRED[order_type]}")
+            return None
+        return builder(symbol, 1 if side.upper() == "BUY" else -1, qty, price)
+
+    async def _submit_order(self, symbol: str, side: str, qty: int, order_payload: dict):
+        """Sends one order payload to Fyers and reports the result. Returns the order ID or None."""
         try:
-            response = self.fyers.place_order(data=order_payload)
-            logger.info(f"Order placement response for {symbol} ({side} {qty}): {response}")
+            response = await self._request("POST", FYERS_ORDERS_URL, order_payload, self.fyers.place_order)
+            logger.info("Order placement response for %s (%s %s): %s", symbol, side, qty, response)
             if response and response.get("code") == 200:
                 order_id = response.get("id")
                 await self.telegram_sender(f"✅ Order Placed for {symbol} ({side} {qty})! Order ID: {order_id}")
@@ -72,39 +167,95 @@ class FyersTradeHandler:
             else:
                 message = response.get("message", "Unknown error during order placement")
                 await self.telegram_sender(f"❌ Order Failed for {symbol} ({side} {qty}): {message}")
-                logger.error(f"Order failed for {symbol}: {message}")
+                logger.error("Order failed for %s: %s", symbol, message)
                 return None
         except exceptions.FyersAPIError as e:
-            logger.error(f"Fyers API Error placing order for {symbol}: {e}")
+            logger.error("Fyers API Error placing order for %s: %s", symbol, e)
             await self.telegram_sender(f"❌ Fyers API Error placing order for {symbol}: {e}")
         except Exception as e:
-            logger.exception(f"An unexpected error occurred during order placement for {symbol}: {e}")
+            logger.exception("An unexpected error occurred during order placement for %s: %s", symbol, e)
             await self.telegram_sender(f"❌ Unexpected Error placing order for {symbol}: {e}")
         return None
 
+    async def place_orders(self, specs: list):
+        """
+        Places several orders with Fyers concurrently.
+        :param specs: List of (symbol, side, qty, order_type[, price]) tuples, as for place_order
+        :return: List of order IDs (None for failed orders), in the same order as specs
+        """
+        if not self.fyers:
+            for spec in specs:
+                await self.telegram_sender(f"Order placement failed for {spec[0]}: Fyers API not initialized.")
+                logger.error("Order placement failed for %s: Fyers API not initialized.", spec[0])
+            return [None] * len(specs)
+
+        await self._refresh_token_if_expiring()
+
+        payloads = [await self._build_payload(*spec) for spec in specs]
+
+        async def _no_order():
+            return None
+
+        return await asyncio.gather(*(
+            self._submit_order(spec[0], spec[1], spec[2], payload) if payload else _no_order()
+            for spec, payload in zip(specs, payloads)
+        ))
+
+    async def place_order(self, symbol: str, side: str, qty: int, order_type: int, price: float = 0.0):
+        """
+        Places an order with Fyers.
+        :param symbol: Fyers instrument symbol (e.g., "NSE:NIFTY50-INDEX")
+        :param side: "BUY" or "SELL"
+        :param qty: Quantity to trade
+        :param order_type: 1 for MARKET, 2 for LIMIT, 3 for STOP, 4 for STOP_LIMIT
+        :param price: Required for LIMIT/STOP_LIMIT orders
+        """
+        return (await self.place_orders([(symbol, side, qty, order_type, price)]))[0]
+
+    def on_order_update(self, order: dict):
+        """
+        Records an order update pushed by the Fyers WebSocket (see FyersWebSocketManager),
+        so get_order_status can answer without fetching the order book.
+        """
+        self._order_feed = True
+        self._remember_order(order)
+
+    def _remember_order(self, order: dict):
+        order_id = order.get("id")
+        if order_id:
+            self._orders[order_id] = order
+
     async def get_order_status(self, order_id: str):
-        """Fetches the status of a specific order."""
+        """
+        Returns the status of a specific order. A locally known order is returned without fetching
+        the order book if its status is final or order updates are pushed to on_order_update.
+        """
+        order = self._orders.get(order_id)
+        if order is not None and (self._order_feed or order.get("status") in _TERMINAL_ORDER_STATUSES):
+            return order
         if not self.fyers:
             logger.error("Cannot get order status: Fyers API not initialized.")
             return None
         try:
-            response = self.fyers.orderbook()
+            response = await self._request("GET", FYERS_ORDERBOOK_URL, sdk_call=self.fyers.orderbook)
             if response and response.get("code") == 200:
-                orders = response.get("orderBook", [])
-                for order in orders:
-                    if order.get("id") == order_id:
-                        logger.info(f"Order status for {order_id}: {order.get('status')}")
-                        return order
-                logger.warning(f"Order ID {order_id} not found in order book.")
+                # Remember every order in the book; finished ones need no further fetches
+                for order in response.get("orderBook", []):
+                    self._remember_order(order)
+                order = self._orders.get(order_id)
+                if order is not None:
+                    logger.info("Order status for %s: %s", order_id, order.get('status'))
+                    return order
+                logger.warning("Order ID %s not found in order book.", order_id)
                 return None
             else:
                 message = response.get("message", "Unknown error fetching order book")
-                logger.error(f"Failed to fetch order book: {message}")
+                logger.error("Failed to fetch order book: %s", message)
                 return None
         except exceptions.FyersAPIError as e:
-            logger.error(f"Fyers API Error fetching order status for {order_id}: {e}")
+            logger.error("Fyers API Error fetching order status for %s: %s", order_id, e)
         except Exception as e:
-            logger.exception(f"An unexpected error occurred fetching order status for {order_id}: {e}")
+            logger.exception("An unexpected error occurred fetching order status for %s: %s", order_id, e)
         return None
 
     async def cancel_order(self, order_id: str):
@@ -114,20 +265,20 @@ class FyersTradeHandler:
             return False
         try:
             cancel_payload = {"id": order_id}
-            response = self.fyers.cancel_order(data=cancel_payload)
+            response = await self._request("DELETE", FYERS_ORDERS_URL, cancel_payload, self.fyers.cancel_order)
             if response and response.get("code") == 200:
-                logger.info(f"Order {order_id} cancelled successfully: {response}")
+                logger.info("Order %s cancelled successfully: %s", order_id, response)
                 await self.telegram_sender(f"Order {order_id} cancelled successfully.")
                 return True
             else:
                 message = response.get("message", "Unknown error during order cancellation")
-                logger.error(f"Failed to cancel order {order_id}: {message}")
+                logger.error("Failed to cancel order %s: %s", order_id, message)
                 await self.telegram_sender(f"Failed to cancel order {order_id}: {message}")
                 return False
         except exceptions.FyersAPIError as e:
-            logger.error(f"Fyers API Error cancelling order {order_id}: {e}")
+            logger.error("Fyers API Error cancelling order %s: %s", order_id, e)
             await self.telegram_sender(f"Fyers API Error cancelling order {order_id}: {e}")
         except Exception as e:
-            logger.exception(f"An unexpected error occurred during order cancellation for {order_id}: {e}")
+            logger.exception("An unexpected error occurred during order cancellation for %s: %s", order_id, e)
             await self.telegram_sender(f"Unexpected Error cancelling order {order_id}: {e}")
         return False
\ No newline at end of file
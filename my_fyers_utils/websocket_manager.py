@@ -1,62 +1,164 @@
 import asyncio
+import collections
 import json
 import logging
+import numpy as np
 from fyers_apiv3.FyersWebsocket import FyersWebsocket
 from config import FYERS_APP_ID, FYERS_DATA_SOCKET_LOG
 
+try:
+    import orjson  # Faster tick decoding; accepts bytes and str
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+TELEGRAM_QUEUE_SIZE = 256 # Notifications beyond this backlog are dropped
+
 class FyersWebSocketManager:
-    def __init__(self, access_token: str, telegram_sender_func):
+    def __init__(self, access_token: str, telegram_sender_func, order_update_handler=None,
+                 telegram_close_func=None):
+        """
+        :param order_update_handler: Optional callable receiving each order update dict
+                                     (e.g., FyersTradeHandler.on_order_update); when given, connect
+                                     also subscribes to order updates
+        :param telegram_close_func: Optional coroutine function awaited by disconnect once every
+                                    notification has been handed over (e.g., TelegramBot.close)
+        """
         self.client_id = FYERS_APP_ID
         self.access_token = access_token
         self.telegram_sender = telegram_sender_func
+        self.telegram_close = telegram_close_func
+        self.order_update_handler = order_update_handler
         self.fyers_ws = None
-        self.ltp_cache = {} # Cache for Last Traded Price
+        self.fyers_order_ws = None # Order update socket, only when order_update_handler is set
+        self.symbols_to_subscribe = []
+        # Last Traded Price per subscribed symbol, indexed by its position in symbols_to_subscribe
+        # (NaN until the first tick); see subscribe_to_symbols
+        self._symbol_index = {}
+        self.ltp = np.empty(0, dtype=np.float64)
+        # Telegram notifications are queued and sent by a single worker task (see _telegram_worker)
+        self._tg_queue = asyncio.Queue(maxsize=TELEGRAM_QUEUE_SIZE)
+        self._tg_worker_task = None
+        self._tg_dropped = 0
+        # Raw messages are buffered by on_message and processed in batches by _message_worker
+        self._rx = collections.deque()
+        self._rx_event = asyncio.Event()
+        self._rx_worker_task = None
+        self._loop = None
+        # Message type ('t') -> handler; other types are ignored
+        self._handlers = {
+            'tf': self._on_tick, # Tickerfeed
+            'om': self._on_order, # Order messages
+        }
+
+    def _notify(self, text):
+        """
+        Queues a Telegram notification from any thread: the SDK calls on_open, on_close and
+        on_error from its own thread, and asyncio.Queue may only be used on the event loop.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._enqueue_notification, text)
+        else:
+            self._enqueue_notification(text)
+
+    def _enqueue_notification(self, text):
+        """Queues a Telegram notification without blocking (event loop only); drops it if the queue is full."""
+        try:
+            self._tg_queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self._tg_dropped += 1
+            logger.warning("Telegram notification queue full, %d message(s) dropped so far", self._tg_dropped)
+
+    async def _telegram_worker(self):
+        """
+        Hands queued notifications to telegram_sender one at a time; joining them into messages
+        within Telegram's length limit is left to the sender (TelegramBot batches its queue).
+        """
+        queue = self._tg_queue
+        while True:
+            text = await queue.get()
+            try:
+                await self.telegram_sender(text)
+            except Exception as e:
+                logger.error("Failed to send Telegram notification: %s", e)
+            finally:
+                queue.task_done()
 
     def on_open(self):
         logger.info("Fyers WebSocket connection opened.")
-        asyncio.create_task(self.telegram_sender("Fyers WebSocket connection opened."))
+        self._notify("Fyers WebSocket connection opened.")
+
+    def _on_tick(self, data):
+        """Handles a tickerfeed ('tf') message."""
+        ltp = (data.get('v') or {}).get('lp') # Last Price
+        i = self._symbol_index.get(data.get('s'))
+        if i is not None and ltp is not None:
+            self.ltp[i] = ltp
+            # logger.debug("Updated LTP for %s: %s", data.get('s'), ltp)
+            # You can add more processing here, e.g., building OHLCV candles
+            # based on tick data
+
+    def _on_order(self, data):
+        """Handles an order update ('om') message."""
+        logger.info("Order Update: %s", data)
+        order = data.get('v') or {}
+        order_get = order.get
+        order_status = order_get('orderStatus', 'UNKNOWN')
+        symbol_name = order_get('symbol', 'N/A')
+        order_id = order_get('id', 'N/A')
+        if self.order_update_handler:
+            self.order_update_handler(order)
+        message_text = f"Order Update for {symbol_name} (ID: {order_id}): Status - {order_status}"
+        self._enqueue_notification(message_text) # Already on the event loop (_message_worker)
+
+    def on_message(self, message):
+        """
+        Callback for incoming WebSocket messages. Only buffers the message (safe to call from the
+        SDK's thread); _message_worker processes everything buffered once per wake-up.
+        """
+        # logger.debug("Received WebSocket message: %s", message)
+        self._rx.append(message)
+        if not self._rx_event.is_set() and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._rx_event.set)
 
-    async def on_message(self, message):
-        """Callback function to handle incoming WebSocket messages."""
-        # logger.debug(f"Received WebSocket message: {message}")
+    async def _message_worker(self):
+        """Drains the message buffer each time on_message signals new messages."""
+        rx = self._rx
+        process = self._process_message
+        while True:
+            await self._rx_event.wait()
+            # Clear before draining: a message appended after this point sets the event again
+            self._rx_event.clear()
+            while rx:
+                process(rx.popleft())
+
+    def _process_message(self, message):
+        """Parses one WebSocket message and dispatches it by type."""
         try:
-            data = json.loads(message)
-            if data and data.get('t') == 'tf': # 't' for type, 'tf' for tickerfeed
-                symbol = data.get('s')
-                ltp = data.get('v', {}).get('lp') # Last Price
-                
-                if symbol and ltp is not None:
-                    self.ltp_cache[symbol] = ltp
-                    # logger.debug(f"Updated LTP for {symbol}: {ltp}")
-                    # You can add more processing here, e.g., building OHLCV candles
-                    # based on tick data
-            
-            # Additional logic for processing other types of messages (e.g., order updates)
-            if data and data.get('t') == 'om': # Order messages
-                logger.info(f"Order Update: {data}")
-                order_status = data.get('v', {}).get('orderStatus', 'UNKNOWN')
-                symbol_name = data.get('v', {}).get('symbol', 'N/A')
-                order_id = data.get('v', {}).get('id', 'N/A')
-                message_text = f"Order Update for {symbol_name} (ID: {order_id}): Status - {order_status}"
-                asyncio.create_task(self.telegram_sender(message_text))
-
-
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding WebSocket message JSON: {e} - Message: {message}")
+            # The SDK may hand over already-decoded messages
+            data = message if isinstance(message, dict) else _json_loads(message)
+            if not data:
+                return
+            handler = self._handlers.get(data.get('t')) # 't' for type
+            if handler is not None:
+                handler(data)
+
+        except json.JSONDecodeError as e: # Also catches orjson.JSONDecodeError
+            logger.error("Error decoding WebSocket message JSON: %s - Message: %s", e, message)
         except Exception as e:
-            logger.exception(f"Error processing WebSocket message: {e} - Message: {message}")
+            logger.exception("Error processing WebSocket message: %s - Message: %s", e, message)
 
     def on_close(self):
         logger.warning("Fyers WebSocket connection closed.")
-        asyncio.create_task(self.telegram_sender("Fyers WebSocket connection closed. Attempting to reconnect..."))
+        self._notify("Fyers WebSocket connection closed. Attempting to reconnect...")
         # Implement re-connection logic here if needed
         # For simplicity, we'll let `connect` handle it, but you might need a loop.
 
     def on_error(self, message):
-        logger.error(f"Fyers WebSocket error: {message}")
-        asyncio.create_task(self.telegram_sender(f"Fyers WebSocket error: {message}"))
+        logger.error("Fyers WebSocket error: %s", message)
+        self._notify(f"Fyers WebSocket error: {message}")
 
     def subscribe_to_symbols(self, symbols: list):
         """Sets the symbols to be subscribed to when connecting."""
@@ -64,7 +166,9 @@ class FyersWebSocketManager:
         # or it uses a different callback mechanism.
         # This will store symbols to be subscribed on connection.
         self.symbols_to_subscribe = symbols
-        logger.info(f"Symbols configured for subscription: {symbols}")
+        self._symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+        self.ltp = np.full(len(symbols), np.nan)
+        logger.info("Symbols configured for subscription: %s", symbols)
 
     async def connect(self):
         """Connects to the Fyers WebSocket and starts listening for messages."""
@@ -73,6 +177,12 @@ class FyersWebSocketManager:
             await self.telegram_sender("Fyers WebSocket connection failed: Access token missing.")
             return
 
+        self._loop = asyncio.get_running_loop()
+        if self._tg_worker_task is None or self._tg_worker_task.done():
+            self._tg_worker_task = asyncio.create_task(self._telegram_worker())
+        if self._rx_worker_task is None or self._rx_worker_task.done():
+            self._rx_worker_task = asyncio.create_task(self._message_worker())
+
         # FyersWebsocket requires client_id and access_token directly
         self.fyers_ws = FyersWebsocket(
             client_id=self.client_id,
@@ -96,14 +206,45 @@ class FyersWebSocketManager:
         # After successful connection, send subscription request
         if self.symbols_to_subscribe:
             await self.fyers_ws.subscribe(symbols=self.symbols_to_subscribe)
-            logger.info(f"Subscription request sent for: {self.symbols_to_subscribe}")
+            logger.info("Subscription request sent for: %s", self.symbols_to_subscribe)
+
+        if self.order_update_handler is not None:
+            await self._connect_order_updates()
+
+    async def _connect_order_updates(self):
+        """Subscribes to order updates; they arrive as 'om' messages through on_message like ticks."""
+        self.fyers_order_ws = FyersWebsocket(
+            client_id=self.client_id,
+            access_token=self.access_token,
+            data_type="orderUpdates",
+            log_path=FYERS_DATA_SOCKET_LOG,
+        )
+        self.fyers_order_ws.onmessage = self.on_message
+        self.fyers_order_ws.onclose = self.on_close
+        self.fyers_order_ws.onerror = self.on_error
+        await self.fyers_order_ws.connect()
+        logger.info("Subscribed to Fyers order updates.")
 
     async def disconnect(self):
         """Disconnects from the Fyers WebSocket."""
         if self.fyers_ws:
             await self.fyers_ws.close()
             logger.info("Fyers WebSocket disconnected.")
+        if self.fyers_order_ws:
+            await self.fyers_order_ws.close()
+            self.fyers_order_ws = None
+        if self._rx_worker_task is not None:
+            self._rx_worker_task.cancel()
+            self._rx_worker_task = None
+        if self._tg_worker_task is not None:
+            if not self._tg_worker_task.done():
+                await self._tg_queue.join() # Hand over the notifications still queued
+            self._tg_worker_task.cancel()
+            self._tg_worker_task = None
+        if self.telegram_close is not None:
+            await self.telegram_close()
 
     def get_ltp_cache(self):
-        """Returns the current LTP cache."""
-        return self.ltp_cache
\ No newline at end of file
+        """Returns {symbol: ltp} for every subscribed symbol that has received a tick."""
+        ltp = self.ltp.tolist()
+        return {symbol: ltp[i] for symbol, i in self._symbol_index.items() if ltp[i] == ltp[i]} # NaN != NaN
\ No newline at end of file
@@ -0,0 +1,25 @@
+import numpy as np
+
+def evaluate_all(ltps, orb_strategy, vwap_strategy, gy_strategy):
+    """
+    Checks the ORB, VWAP and GY signals of every symbol in one call, with the same rules
+    as each strategy's check_signals_batch (without GY's signal logging).
+    The three strategies must have been created with the same symbols list, so their rows line up.
+    :param ltps: Array of LTPs in that symbol order (NaN = no price)
+    :return: (orb, vwap, gy) int8 arrays with 1 (BUY), -1 (SELL) or 0 per symbol
+    """
+    orb = orb_strategy.open_range
+    gy = gy_strategy.symbol_data
+    vwap = vwap_strategy.vwap['vwap']
+    if not len(ltps) == len(orb) == len(vwap) == len(gy):
+        raise ValueError("Strategies must be created with the same symbols as the LTP array")
+
+    orb_signals = (ltps > orb['high']).astype(np.int8) - (ltps < orb['low']).astype(np.int8)
+
+    vwap_signals = (ltps > vwap).astype(np.int8) - (ltps < vwap).astype(np.int8)
+
+    gy_vwap = gy['vwap']
+    close_price = gy['close']
+    gy_signals = (((ltps > gy_vwap) & (close_price < gy['vwap_lower'])).astype(np.int8)
+                  - ((ltps < gy_vwap) & (close_price > gy['vwap_upper'])).astype(np.int8))
+    return orb_signals, vwap_signals, gy_signals
@@ -1,66 +1,82 @@
-import pandas as pd
-import pandas_ta as ta
+import numpy as np
 import logging
+from utils.helpers import STRATEGY_GY, OHLCVRing, SymbolArrays, VwapState
 
 logger = logging.getLogger(__name__)
 
 class GYStrategy:
-    def __init__(self, trap_threshold=0.001, vwap_rejection_strength=0.0005):
+    def __init__(self, trap_threshold=0.001, vwap_rejection_strength=0.0005, symbols=(), signal_buffer=None):
         """
         Initializes the GY Strategy with parameters.
         :param trap_threshold: Percentage deviation to consider a "trap" (e.g., 0.1% for 0.001)
         :param vwap_rejection_strength: Percentage deviation from VWAP for rejection (e.g., 0.05% for 0.0005)
+        :param symbols: Optional symbol list fixing the row order (see strategies.combined.evaluate_all)
+        :param signal_buffer: Optional SignalBuffer that records signals instead of logging them
         """
+        self.signal_buffer = signal_buffer
         self.trap_threshold = trap_threshold
         self.vwap_rejection_strength = vwap_rejection_strength
-        self.symbol_data = {} # To store required data per symbol (e.g., VWAP, previous close/high/low)
-
-    async def update_data(self, symbol, candles_df):
+        # Band/threshold multipliers, so each band is a single multiplication
+        self._k_up = 1.0 + vwap_rejection_strength
+        self._k_dn = 1.0 - vwap_rejection_strength
+        self._trap_k_up = 1.0 + trap_threshold
+        self._trap_k_dn = 1.0 - trap_threshold
+        # Required data per symbol (VWAP and latest candle); NaN until the symbol's first update
+        # (VWAP rejection bands are cached alongside, recomputed only when the VWAP changes)
+        self.symbol_data = SymbolArrays('vwap', 'vwap_upper', 'vwap_lower', 'open', 'high', 'low', 'close', 'prev_close',
+                                        symbols=symbols)
+        self.vwap_state = {} # Running VWAP state (VwapState) per symbol
+
+    def update_data(self, symbol, candles):
         """
         Updates internal data required for GY strategy calculations.
         This function needs to be called with updated candle data periodically.
         :param symbol: Trading symbol
-        :param candles_df: Pandas DataFrame with columns 'open', 'high', 'low', 'close', 'volume'
+        :param candles: OHLCVRing with the symbol's session candles (see VwapState.update_from_ring)
         """
-        if 'volume' not in candles_df.columns:
-            logger.warning(f"Volume data not available for {symbol}. VWAP cannot be calculated for GY Strategy.")
-            return
-
-        # Calculate VWAP
-        candles_df.ta.vwap(append=True)
-
-        if 'VWAP' in candles_df.columns and not candles_df.empty:
-            latest_candle = candles_df.iloc[-1]
-            self.symbol_data[symbol] = {
-                'vwap': latest_candle['VWAP'],
-                'open': latest_candle['open'],
-                'high': latest_candle['high'],
-                'low': latest_candle['low'],
-                'close': latest_candle['close'],
-                'prev_close': candles_df.iloc[-2]['close'] if len(candles_df) > 1 else latest_candle['close'] # Needs at least 2 candles
-            }
-            logger.debug(f"Updated GY Strategy data for {symbol}: {self.symbol_data[symbol]}")
+        # Update the running VWAP with the new candles
+        state = self.vwap_state.get(symbol)
+        if state is None:
+            state = self.vwap_state[symbol] = VwapState()
+        vwap = state.update_from_ring(candles)
+
+        if vwap is not None and len(candles):
+            tail = candles.window(2) # Previous and latest candle
+            open_price, high, low, close_price = tail[-1, :4]
+            columns = self.symbol_data.columns
+            i = self.symbol_data.row(symbol)
+            columns['vwap'][i] = vwap
+            columns['vwap_upper'][i] = vwap * self._k_up
+            columns['vwap_lower'][i] = vwap * self._k_dn
+            columns['open'][i] = open_price
+            columns['high'][i] = high
+            columns['low'][i] = low
+            columns['close'][i] = close_price
+            columns['prev_close'][i] = tail[0, 3] # Same as close with only 1 candle
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Updated GY Strategy data for %s: VWAP=%s, close=%s", symbol, vwap, columns['close'][i])
         else:
-            logger.error(f"Failed to update GY Strategy data for {symbol}. Check candles_df and VWAP calculation.")
+            logger.error("Failed to update GY Strategy data for %s. Check candles and VWAP calculation.", symbol)
 
-    async def check_signal(self, symbol, current_ltp):
+    def check_signal(self, symbol, current_ltp):
         """
         Checks for GY Strategy (Trap Breakout + VWAP Rejection) signals.
         :param symbol: Trading symbol
         :param current_ltp: Current Last Traded Price
         :return: 'BUY', 'SELL', or None
         """
-        if symbol not in self.symbol_data:
-            logger.warning(f"GY Strategy data not available for {symbol}. Cannot check signal.")
+        i = self.symbol_data.index.get(symbol)
+        columns = self.symbol_data.columns
+        if i is None or np.isnan(columns['vwap'][i]):
+            logger.warning("GY Strategy data not available for %s. Cannot check signal.", symbol)
             return None
 
-        data = self.symbol_data[symbol]
-        vwap = data['vwap']
-        open_price = data['open']
-        high = data['high']
-        low = data['low']
-        close_price = data['close']
-        prev_close = data['prev_close']
+        vwap = columns['vwap'][i]
+        open_price = columns['open'][i]
+        high = columns['high'][i]
+        low = columns['low'][i]
+        close_price = columns['close'][i]
+        prev_close = columns['prev_close'][i]
 
         # Logic for Trap Breakout:
         # A trap can occur when price moves significantly past a key level (e.g., previous close, day's high/low)
@@ -76,8 +92,8 @@ class GYStrategy:
 
         # If current LTP is significantly below the day's high but above the day's open
         # and it had briefly gone above previous close (indicating failed breakout)
-        if current_ltp < (high - high * self.trap_threshold) and current_ltp > open_price:
-            if high > (prev_close + prev_close * self.trap_threshold): # If it broke prev_close significantly
+        if current_ltp < high * self._trap_k_dn and current_ltp > open_price:
+            if high > prev_close * self._trap_k_up: # If it broke prev_close significantly
                  # This is a very rough interpretation of a "trap"
                 pass # You'd need more complex candle pattern recognition here
         
@@ -86,21 +102,48 @@ class GYStrategy:
         # Buy signal if price drops near VWAP and bounces up (LTP > VWAP but was lower)
         # Sell signal if price rises near VWAP and bounces down (LTP < VWAP but was higher)
 
-        vwap_upper_band = vwap * (1 + self.vwap_rejection_strength)
-        vwap_lower_band = vwap * (1 - self.vwap_rejection_strength)
+        vwap_upper_band = columns['vwap_upper'][i]
+        vwap_lower_band = columns['vwap_lower'][i]
 
         # Assuming 'close_price' is the previous candle's close
         # If current_ltp has crossed above vwap from below (rejection from below)
         if current_ltp > vwap and close_price < vwap_lower_band:
-            logger.info(f"GY BUY signal for {symbol}: LTP {current_ltp} crossed above VWAP {vwap} from below.")
+            if self.signal_buffer is not None:
+                self.signal_buffer.push(i, STRATEGY_GY, 1, current_ltp)
+            else:
+                logger.info("GY BUY signal for %s: LTP %s crossed above VWAP %s from below.", symbol, current_ltp, vwap)
             return "BUY"
         # If current_ltp has crossed below vwap from above (rejection from above)
         elif current_ltp < vwap and close_price > vwap_upper_band:
-            logger.info(f"GY SELL signal for {symbol}: LTP {current_ltp} crossed below VWAP {vwap} from above.")
+            if self.signal_buffer is not None:
+                self.signal_buffer.push(i, STRATEGY_GY, -1, current_ltp)
+            else:
+                logger.info("GY SELL signal for %s: LTP %s crossed below VWAP %s from above.", symbol, current_ltp, vwap)
             return "SELL"
 
         return None
 
+    def check_signals_batch(self, ltps):
+        """
+        Checks VWAP rejection for all symbols at once; same rules as check_signal.
+        :param ltps: Array of LTPs in self.symbol_data.symbols order (NaN = no price)
+        :return: int8 array with 1 (BUY), -1 (SELL) or 0 per symbol
+        """
+        data = self.symbol_data
+        vwap = data['vwap']
+        close_price = data['close']
+        buy = (ltps > vwap) & (close_price < data['vwap_lower'])
+        sell = (ltps < vwap) & (close_price > data['vwap_upper'])
+        signals = buy.astype(np.int8) - sell.astype(np.int8)
+        if self.signal_buffer is not None:
+            rows = np.flatnonzero(signals)
+            self.signal_buffer.push_many(rows, STRATEGY_GY, signals[rows], ltps[rows])
+        elif logger.isEnabledFor(logging.INFO):
+            for i in np.flatnonzero(signals):
+                logger.info("GY %s signal for %s: LTP %s vs VWAP %s", "BUY" if signals[i] > 0 else "SELL",
+                            data.symbols[i], ltps[i], vwap[i])
+        return signals
+
 # Example Usage (This would be integrated into main.py or a data processing module)
 if __name__ == "__main__":
     # Dummy data for demonstration (replace with actual historical data)
@@ -111,19 +154,22 @@ if __name__ == "__main__":
         {'open': 100.5, 'high': 102, 'low': 99.5, 'close': 101.5, 'volume': 1300}, # Bounces back
         {'open': 101.5, 'high': 103, 'low': 100, 'close': 102.5, 'volume': 1400}
     ]
-    candles_df = pd.DataFrame(data_points)
+    candles = OHLCVRing()
+    for candle in data_points[:3]:
+        candles.push(candle['open'], candle['high'], candle['low'], candle['close'], candle['volume'])
 
     gy_strategy = GYStrategy()
     
     # Simulate real-time updates:
-    async def simulate_gy_signals():
-        await gy_strategy.update_data("NSE:EXAMPLE-EQ", candles_df.iloc[:3])
-        print(f"LTP 101.8, Signal: {await gy_strategy.check_signal('NSE:EXAMPLE-EQ', 101.8)}") # Should be around VWAP
-        
-        await gy_strategy.update_data("NSE:EXAMPLE-EQ", candles_df.iloc[:4]) # New candle for update
-        print(f"LTP 100.2, Signal: {await gy_strategy.check_signal('NSE:EXAMPLE-EQ', 100.2)}") # Below VWAP
-        
-        await gy_strategy.update_data("NSE:EXAMPLE-EQ", candles_df.iloc[:5]) # New candle for update
-        print(f"LTP 102.8, Signal: {await gy_strategy.check_signal('NSE:EXAMPLE-EQ', 102.8)}") # Above VWAP, potential BUY
-
-    asyncio.run(simulate_gy_signals())
\ No newline at end of file
+    gy_strategy.update_data("NSE:EXAMPLE-EQ", candles)
+    print(f"LTP 101.8, Signal: {gy_strategy.check_signal('NSE:EXAMPLE-EQ', 101.8)}") # Should be around VWAP
+
+    candle = data_points[3] # New candle for update
+    candles.push(candle['open'], candle['high'], candle['low'], candle['close'], candle['volume'])
+    gy_strategy.update_data("NSE:EXAMPLE-EQ", candles)
+    print(f"LTP 100.2, Signal: {gy_strategy.check_signal('NSE:EXAMPLE-EQ', 100.2)}") # Below VWAP
+
+    candle = data_points[4] # New candle for update
+    candles.push(candle['open'], candle['high'], candle['low'], candle['close'], candle['volume'])
+    gy_strategy.update_data("NSE:EXAMPLE-EQ", candles)
+    print(f"LTP 102.8, Signal: {gy_strategy.check_signal('NSE:EXAMPLE-EQ', 102.8)}") # Above VWAP, potential BUY
\ No newline at end of file
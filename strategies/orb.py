@@ -1,72 +1,100 @@
-import pandas as pd
+import numpy as np
 import logging
+from utils.helpers import STRATEGY_ORB, OHLCVRing, SymbolArrays
 
 logger = logging.getLogger(__name__)
 
+_SIGNALS = (None, "BUY", "SELL") # Indexed by side: 0, 1, -1
+
 class ORBStrategy:
-    def __init__(self, open_range_minutes=15):
+    def __init__(self, open_range_minutes=15, symbols=(), signal_buffer=None):
+        """
+        :param open_range_minutes: Number of opening candles that make up the range
+        :param symbols: Optional symbol list fixing the row order (see strategies.combined.evaluate_all)
+        :param signal_buffer: Optional SignalBuffer that records signals instead of logging them
+        """
         self.open_range_minutes = open_range_minutes
-        self.open_range_high = {}
-        self.open_range_low = {}
-        self.orb_initialized = {}
+        self.signal_buffer = signal_buffer
+        # Open range high/low per symbol (NaN until the symbol's ORB is initialized)
+        self.open_range = SymbolArrays("high", "low", symbols=symbols)
 
-    async def calculate_orb(self, symbol, candles_df):
+    def calculate_orb(self, symbol, candles):
         """
         Calculates the Open Range for a given symbol.
         :param symbol: Trading symbol (e.g., NSE:NIFTY50-INDEX)
-        :param candles_df: Pandas DataFrame with columns 'datetime', 'high', 'low'
+        :param candles: OHLCVRing with the symbol's session candles
         """
-        if symbol not in self.orb_initialized:
-            # Filter candles for the open range period (e.g., first 15 minutes)
-            # Assuming candles_df is sorted by datetime and contains 1-minute or similar granular data
-            
-            # This is a simplification. In a real scenario, you'd define market open time
-            # and slice candles based on that.
-            first_n_candles = candles_df.head(self.open_range_minutes)
-            
-            if not first_n_candles.empty:
-                self.open_range_high[symbol] = first_n_candles['high'].max()
-                self.open_range_low[symbol] = first_n_candles['low'].min()
-                self.orb_initialized[symbol] = True
-                logger.info(f"ORB initialized for {symbol}: High={self.open_range_high[symbol]}, Low={self.open_range_low[symbol]}")
-            else:
-                logger.warning(f"Not enough data to initialize ORB for {symbol}")
-        
-    async def check_signal(self, symbol, current_ltp):
+        i = self.open_range.index.get(symbol)
+        if i is not None and not np.isnan(self.open_range.columns["high"][i]):
+            return # The open range is fixed once initialized
+
+        # Filter candles for the open range period (e.g., first 15 minutes)
+        # Assuming the ring holds the session's 1-minute or similar granular candles
+
+        # This is a simplification. In a real scenario, you'd define market open time
+        # and slice candles based on that.
+        opening = candles.first(self.open_range_minutes)
+
+        if len(opening) == self.open_range_minutes: # Wait for the full range; it is fixed once set
+            orb_high = float(opening[:, 1].max())
+            orb_low = float(opening[:, 2].min())
+            i = self.open_range.row(symbol)
+            self.open_range.columns["high"][i] = orb_high
+            self.open_range.columns["low"][i] = orb_low
+            logger.info("ORB initialized for %s: High=%s, Low=%s", symbol, orb_high, orb_low)
+        else:
+            logger.warning("Not enough data to initialize ORB for %s", symbol)
+
+    def check_signal(self, symbol, current_ltp):
         """
         Checks for ORB breakout signals.
         :param symbol: Trading symbol
         :param current_ltp: Current Last Traded Price
         :return: 'BUY', 'SELL', or None
         """
-        if symbol in self.orb_initialized:
-            orb_high = self.open_range_high[symbol]
-            orb_low = self.open_range_low[symbol]
+        i = self.open_range.index.get(symbol)
+        if i is None:
+            return None
+        orb_high = self.open_range.columns["high"][i]
+        orb_low = self.open_range.columns["low"][i]
+
+        # 1 above the range, -1 below it, 0 inside (or not initialized: NaN compares False)
+        side = int(current_ltp > orb_high) - int(current_ltp < orb_low)
+        if side:
+            # DEBUG: these fire on every tick while the price stays outside the range
+            if self.signal_buffer is not None:
+                self.signal_buffer.push(i, STRATEGY_ORB, side, current_ltp)
+            elif side > 0:
+                logger.debug("ORB BUY signal for %s: LTP %s > ORB High %s", symbol, current_ltp, orb_high)
+            else:
+                logger.debug("ORB SELL signal for %s: LTP %s < ORB Low %s", symbol, current_ltp, orb_low)
+        return _SIGNALS[side]
 
-            if current_ltp > orb_high:
-                logger.info(f"ORB BUY signal for {symbol}: LTP {current_ltp} > ORB High {orb_high}")
-                return "BUY"
-            elif current_ltp < orb_low:
-                logger.info(f"ORB SELL signal for {symbol}: LTP {current_ltp} < ORB Low {orb_low}")
-                return "SELL"
-        return None
+    def check_signals_batch(self, ltps):
+        """
+        Checks ORB breakouts for all initialized symbols at once.
+        :param ltps: Array of LTPs in self.open_range.symbols order (NaN = no price)
+        :return: int8 array with 1 (BUY), -1 (SELL) or 0 per symbol
+        """
+        return (ltps > self.open_range["high"]).astype(np.int8) - (ltps < self.open_range["low"]).astype(np.int8)
 
 # Example Usage (This would be integrated into main.py or a data processing module)
 if __name__ == "__main__":
     # Dummy data for demonstration (replace with actual historical data)
+    # 1-minute candles from 09:15 to 09:22
     data = {
-        'datetime': pd.to_datetime(['2023-01-01 09:15:00', '2023-01-01 09:16:00', '2023-01-01 09:17:00', '2023-01-01 09:18:00',
-                                    '2023-01-01 09:19:00', '2023-01-01 09:20:00', '2023-01-01 09:21:00', '2023-01-01 09:22:00']),
         'high': [100, 102, 101, 103, 104, 105, 106, 107],
         'low': [98, 99, 97, 98, 99, 100, 101, 102],
         'close': [99, 101, 98, 100, 103, 104, 105, 106]
     }
-    candles_df = pd.DataFrame(data)
-    
+    candles = OHLCVRing()
+    for high, low, close in zip(data['high'], data['low'], data['close']):
+        candles.push(close, high, low, close, 0)
+
     orb_strategy = ORBStrategy(open_range_minutes=5)
-    asyncio.run(orb_strategy.calculate_orb("NSE:EXAMPLE-EQ", candles_df))
+    orb_strategy.calculate_orb("NSE:EXAMPLE-EQ", candles)
 
     # Test signals
-    print(f"Signal for 99: {asyncio.run(orb_strategy.check_signal('NSE:EXAMPLE-EQ', 99))}")
-    print(f"Signal for 105: {asyncio.run(orb_strategy.check_signal('NSE:EXAMPLE-EQ', 105))}")
-    print(f"Signal for 97: {asyncio.run(orb_strategy.check_signal('NSE:EXAMPLE-EQ', 97))}")
\ No newline at end of file
+    print(f"Signal for 99: {orb_strategy.check_signal('NSE:EXAMPLE-EQ', 99)}")
+    print(f"Signal for 105: {orb_strategy.check_signal('NSE:EXAMPLE-EQ', 105)}")
+    print(f"Signal for 97: {orb_strategy.check_signal('NSE:EXAMPLE-EQ', 97)}")
\ No newline at end of file
@@ -1,51 +1,72 @@
-import pandas as pd
-import pandas_ta as ta
+import numpy as np
 import logging
+from utils.helpers import STRATEGY_VWAP, OHLCVRing, SymbolArrays, VwapState
 
 logger = logging.getLogger(__name__)
 
 class VWAPStrategy:
-    def __init__(self):
-        self.symbol_vwap_data = {} # To store VWAP and its related data per symbol
+    def __init__(self, symbols=(), signal_buffer=None):
+        """
+        :param symbols: Optional symbol list fixing the row order (see strategies.combined.evaluate_all)
+        :param signal_buffer: Optional SignalBuffer that records signals instead of logging them
+        """
+        self.signal_buffer = signal_buffer
+        self.symbol_vwap_data = {} # Running VWAP state (VwapState) per symbol
+        self.vwap = SymbolArrays("vwap", symbols=symbols) # Latest VWAP per symbol, read by the signal checks
 
-    async def calculate_vwap(self, symbol, candles_df):
+    def calculate_vwap(self, symbol, candles):
         """
-        Calculates VWAP for a given symbol.
+        Updates the VWAP for a given symbol with the candles added since the last call.
         :param symbol: Trading symbol
-        :param candles_df: Pandas DataFrame with columns 'high', 'low', 'close', 'volume'
+        :param candles: OHLCVRing with the symbol's session candles (see VwapState.update_from_ring)
         """
-        if 'volume' not in candles_df.columns:
-            logger.warning(f"Volume data not available for {symbol}. Cannot calculate VWAP.")
-            return
+        state = self.symbol_vwap_data.get(symbol)
+        if state is None:
+            state = self.symbol_vwap_data[symbol] = VwapState()
+        vwap = state.update_from_ring(candles)
 
-        # Ensure correct column names for pandas_ta
-        # pandas_ta expects 'high', 'low', 'close', 'volume'
-        # It adds 'VWAP' column to the DataFrame
-        candles_df.ta.vwap(append=True)
-        
-        if 'VWAP' in candles_df.columns:
-            self.symbol_vwap_data[symbol] = candles_df['VWAP'].iloc[-1] # Get latest VWAP
-            logger.debug(f"Calculated VWAP for {symbol}: {self.symbol_vwap_data[symbol]}")
+        if vwap is not None:
+            i = self.vwap.row(symbol) # May grow the arrays, so look up the column afterwards
+            self.vwap.columns["vwap"][i] = vwap
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Calculated VWAP for %s: %s", symbol, vwap)
         else:
-            logger.error(f"VWAP calculation failed for {symbol}. Check pandas_ta setup and data.")
+            logger.error("VWAP calculation failed for %s. Check candle data and volume.", symbol)
 
-    async def check_signal(self, symbol, current_ltp):
+    def check_signal(self, symbol, current_ltp):
         """
         Checks for VWAP signals (LTP crossing VWAP).
         :param symbol: Trading symbol
         :param current_ltp: Current Last Traded Price
         :return: 'BUY', 'SELL', or None
         """
-        if symbol in self.symbol_vwap_data:
-            vwap = self.symbol_vwap_data[symbol]
+        i = self.vwap.index.get(symbol)
+        if i is not None:
+            vwap = self.vwap.columns["vwap"][i]
+            # DEBUG: these fire on every tick while the price stays on one side of VWAP
             if current_ltp > vwap:
-                logger.info(f"VWAP BUY signal for {symbol}: LTP {current_ltp} > VWAP {vwap}")
+                if self.signal_buffer is not None:
+                    self.signal_buffer.push(i, STRATEGY_VWAP, 1, current_ltp)
+                else:
+                    logger.debug("VWAP BUY signal for %s: LTP %s > VWAP %s", symbol, current_ltp, vwap)
                 return "BUY"
             elif current_ltp < vwap:
-                logger.info(f"VWAP SELL signal for {symbol}: LTP {current_ltp} < VWAP {vwap}")
+                if self.signal_buffer is not None:
+                    self.signal_buffer.push(i, STRATEGY_VWAP, -1, current_ltp)
+                else:
+                    logger.debug("VWAP SELL signal for %s: LTP %s < VWAP %s", symbol, current_ltp, vwap)
                 return "SELL"
         return None
 
+    def check_signals_batch(self, ltps):
+        """
+        Checks LTP vs VWAP for all symbols with a VWAP at once.
+        :param ltps: Array of LTPs in self.vwap.symbols order (NaN = no price)
+        :return: int8 array with 1 (BUY), -1 (SELL) or 0 per symbol
+        """
+        vwap = self.vwap["vwap"]
+        return (ltps > vwap).astype(np.int8) - (ltps < vwap).astype(np.int8)
+
 # Example Usage (This would be integrated into main.py or a data processing module)
 if __name__ == "__main__":
     # Dummy data for demonstration (replace with actual historical data)
@@ -55,11 +76,13 @@ if __name__ == "__main__":
         'close': [99, 101, 98, 100, 103, 104, 105, 106],
         'volume': [1000, 1200, 900, 1500, 1100, 1300, 1000, 1400]
     }
-    candles_df = pd.DataFrame(data)
-    
+    candles = OHLCVRing()
+    for high, low, close, volume in zip(data['high'], data['low'], data['close'], data['volume']):
+        candles.push(close, high, low, close, volume) # open is not used by VWAP
+
     vwap_strategy = VWAPStrategy()
-    asyncio.run(vwap_strategy.calculate_vwap("NSE:EXAMPLE-EQ", candles_df))
+    vwap_strategy.calculate_vwap("NSE:EXAMPLE-EQ", candles)
 
     # Test signals
-    print(f"Signal for 103 (assuming VWAP around 102): {asyncio.run(vwap_strategy.check_signal('NSE:EXAMPLE-EQ', 103))}")
-    print(f"Signal for 101 (assuming VWAP around 102): {asyncio.run(vwap_strategy.check_signal('NSE:EXAMPLE-EQ', 101))}")
\ No newline at end of file
+    print(f"Signal for 103 (assuming VWAP around 102): {vwap_strategy.check_signal('NSE:EXAMPLE-EQ', 103)}")
+    print(f"Signal for 101 (assuming VWAP around 102): {vwap_strategy.check_signal('NSE:EXAMPLE-EQ', 101)}")
\ No newline at end of file
@@ -1,39 +1,281 @@
 import telegram
 import asyncio
 import logging
+from functools import lru_cache
+from html import escape
+from html.parser import HTMLParser
+from telegram.request import HTTPXRequest
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
 
 logger = logging.getLogger(__name__)
 
+TELEGRAM_POOL_SIZE = 8 # Pooled keep-alive connections; also the send_many concurrency limit
+TELEGRAM_POOL_TIMEOUT = 5.0 # Seconds to wait for a free pooled connection
+TELEGRAM_BATCH_WINDOW = 0.05 # Seconds to collect a burst of alerts into one message
+TELEGRAM_MAX_MESSAGE_LEN = 4096 # Telegram's limit for one message
+
+# Static HTML is written once here; only the variable parts are escaped per message
+ALERT_TEMPLATE = "<b>{title}</b>\n{body}"
+# Signal alert chrome per side, ready to send; format_signal only appends "<symbol> @ <price>"
+SIGNAL_PREFIXES = {
+    "BUY": "<b>GANGU PRO</b> 🟢 <b>BUY</b> ",
+    "SELL": "<b>GANGU PRO</b> 🔴 <b>SELL</b> ",
+}
+
+_shared_bot = None
+
+
+def _get_bot():
+    """Returns the process-wide telegram.Bot, so every TelegramBot reuses one HTTP connection pool."""
+    global _shared_bot
+    if _shared_bot is None:
+        request = HTTPXRequest(connection_pool_size=TELEGRAM_POOL_SIZE, http_version='1.1',
+                               pool_timeout=TELEGRAM_POOL_TIMEOUT)
+        _shared_bot = telegram.Bot(token=TELEGRAM_BOT_TOKEN, request=request)
+    return _shared_bot
+
+
+def format_alert(title, body):
+    """
+    Builds an HTML alert from plain-text parts.
+    :param title: Bold first line (e.g., "GY BUY NSE:SBIN-EQ")
+    :param body: Message text; '<', '>' and '&' are escaped so Telegram does not reject it
+    """
+    return ALERT_TEMPLATE.format(title=escape(str(title), quote=False), body=escape(str(body), quote=False))
+
+
+@lru_cache(maxsize=1024)
+def _escape_symbol(symbol):
+    return escape(symbol, quote=False) # Symbols repeat, so each is escaped once
+
+
+def format_signal(symbol, side, price):
+    """
+    Builds an HTML signal alert, e.g. "GANGU PRO 🟢 BUY NSE:SBIN-EQ @ 612.35".
+    :param symbol: Trading symbol
+    :param side: "BUY" or "SELL"
+    :param price: Signal price (a number, so it needs no escaping)
+    """
+    prefix = SIGNAL_PREFIXES.get(side)
+    if prefix is None:
+        prefix = f"<b>GANGU PRO</b> <b>{escape(str(side), quote=False)}</b> "
+    return f"{prefix}{_escape_symbol(symbol)} @ {price}"
+
+
+# Tags and named entities Telegram accepts in HTML parse mode
+TELEGRAM_HTML_TAGS = frozenset(("b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "a", "code",
+                                "pre", "span", "tg-spoiler", "tg-emoji", "blockquote"))
+TELEGRAM_HTML_ENTITIES = frozenset(("lt", "gt", "amp", "quot"))
+
+
+class _TelegramHTMLChecker(HTMLParser):
+    """Checks that text is HTML Telegram can parse: known tags, properly nested, no bare '<' or '&'."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.valid = True
+        self._open = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in TELEGRAM_HTML_TAGS:
+            self.valid = False
+        self._open.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self._open or self._open.pop() != tag:
+            self.valid = False
+
+    def handle_entityref(self, name):
+        if name not in TELEGRAM_HTML_ENTITIES:
+            self.valid = False
+
+    def handle_data(self, data):
+        if "<" in data or ">" in data or "&" in data: # Left over by the lenient parser
+            self.valid = False
+
+    def unknown_decl(self, data):
+        self.valid = False
+
+    def handle_comment(self, data):
+        self.valid = False
+
+    def handle_decl(self, decl):
+        self.valid = False
+
+    def handle_pi(self, data):
+        self.valid = False
+
+    def check(self, text):
+        """Returns True if text is valid; call once per instance."""
+        self.feed(text)
+        self.close() # Flushes an unterminated tag as data, which marks it invalid
+        return self.valid and not self._open
+
+
+def _as_telegram_html(message):
+    """
+    Returns message unchanged if it is HTML Telegram accepts (e.g., from format_alert/format_signal),
+    otherwise escaped as plain text, so free text such as exception messages is never rejected.
+    """
+    message = str(message)
+    if "<" not in message and "&" not in message and ">" not in message:
+        return message
+    if _TelegramHTMLChecker().check(message):
+        return message
+    return escape(message, quote=False)
+
+
+def _safe_cut(text, limit):
+    """Returns the largest cut position <= limit that is not inside an HTML tag or entity."""
+    cut = limit
+    tag_start = text.rfind("<", 0, cut)
+    if tag_start > text.rfind(">", 0, cut):
+        cut = tag_start
+    entity_start = text.rfind("&", 0, cut)
+    if entity_start > text.rfind(";", 0, cut):
+        cut = entity_start
+    return cut or limit
+
+
+def _split_message(text, limit=TELEGRAM_MAX_MESSAGE_LEN):
+    """Splits text into parts of at most limit characters at line boundaries (a longer line is cut)."""
+    parts = []
+    part = ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if part:
+                parts.append(part)
+                part = ""
+            cut = _safe_cut(line, limit)
+            parts.append(line[:cut])
+            line = line[cut:]
+        if not part:
+            part = line
+        elif len(part) + 1 + len(line) <= limit:
+            part += "\n" + line
+        else:
+            parts.append(part)
+            part = line
+    if part:
+        parts.append(part)
+    return parts
+
+
 class TelegramBot:
     def __init__(self):
-        self.bot = telegram.Bot(token=TELEGRAM_BOT_TOKEN)
+        # Decided once: when unconfigured, messages are dropped without any network I/O
+        self._enabled = bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
+        self.bot = _get_bot() if self._enabled else None
         self.chat_id = TELEGRAM_CHAT_ID
-        if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+        if not self._enabled:
             logger.error("Telegram BOT_TOKEN or CHAT_ID is not configured. Telegram alerts will not work.")
+        # Messages are queued by send_message and sent by a single worker task (see _drain)
+        self._queue = asyncio.Queue()
+        self._worker = None
 
     async def send_message(self, message):
-        """Sends a message to the configured Telegram chat ID."""
-        if not self.bot or not self.chat_id:
-            logger.error("Telegram bot not initialized. Cannot send message.")
+        """
+        Queues a message for the configured Telegram chat ID and returns immediately.
+        Messages queued within TELEGRAM_BATCH_WINDOW of each other are sent as one.
+        :param message: HTML (see format_alert) or plain text; text that is not valid Telegram HTML
+                        is escaped so it cannot get a joined batch rejected
+        """
+        if not self._enabled:
             return
+        self._queue.put_nowait(_as_telegram_html(message))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain())
+
+    async def send_signal(self, symbol, side, price):
+        """Queues a signal alert built by format_signal; send_message stays available for free text."""
+        await self.send_message(format_signal(symbol, side, price))
+
+    async def _drain(self):
+        """
+        Sends queued messages, joining each burst into as few Telegram messages as possible.
+        This is the only place messages are joined or split to fit TELEGRAM_MAX_MESSAGE_LEN,
+        always at message or line boundaries.
+        """
+        queue = self._queue
+        pending = None
+        while True:
+            batch = [pending if pending is not None else await queue.get()]
+            pending = None
+            await asyncio.sleep(TELEGRAM_BATCH_WINDOW)
+            size = len(batch[0])
+            while size <= TELEGRAM_MAX_MESSAGE_LEN:
+                try:
+                    message = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if size + 1 + len(message) > TELEGRAM_MAX_MESSAGE_LEN:
+                    pending = message # Starts the next message
+                    break
+                batch.append(message)
+                size += 1 + len(message)
+            try:
+                if not await self._send_text("\n".join(batch)) and len(batch) > 1:
+                    # Telegram rejected the joined text; send each message on its own
+                    for message in batch:
+                        await self._send_text(message)
+            finally:
+                # pending is marked done when it is sent with the next batch
+                for _ in batch:
+                    queue.task_done()
+
+    async def _send_text(self, text):
+        """Sends text in as many messages as TELEGRAM_MAX_MESSAGE_LEN needs; False if Telegram rejected any."""
+        accepted = True
+        for part in _split_message(text):
+            accepted = await self._send(part) and accepted
+        return accepted
 
+    async def close(self):
+        """Waits until every queued message has been sent, then stops the worker."""
+        if self._worker is not None and not self._worker.done():
+            await self._queue.join()
+            self._worker.cancel()
+        self._worker = None
+
+    async def _send(self, message):
+        """Sends one message to the configured Telegram chat ID. Returns False if Telegram rejected it."""
         try:
             # Use parse_mode=telegram.ParseMode.MARKDOWN_V2 for rich formatting
             # Be careful with special characters when using MARKDOWN_V2, they need escaping
             await self.bot.send_message(chat_id=self.chat_id, text=message, parse_mode=telegram.constants.ParseMode.HTML)
-            logger.info(f"Telegram message sent: {message}")
+            logger.info("Telegram message sent: %s", message)
+        except telegram.error.BadRequest as e:
+            # e.g., "Can't parse entities": the message itself was rejected
+            logger.error("Telegram rejected message: %s. Message: '%s'", e, message)
+            return False
         except telegram.error.TelegramError as e:
-            logger.error(f"Telegram API Error sending message: {e}")
-            logger.error(f"Check if bot token and chat ID are correct. Message: '{message}'")
+            logger.error("Telegram API Error sending message: %s", e)
+            logger.error("Check if bot token and chat ID are correct. Message: '%s'", message)
         except Exception as e:
-            logger.exception(f"Unexpected error sending Telegram message: {e}")
+            logger.exception("Unexpected error sending Telegram message: %s", e)
+        return True
+
+    async def send_many(self, messages):
+        """
+        Sends several messages right away as separate messages, bypassing the queue.
+        At most TELEGRAM_POOL_SIZE are in flight at a time over the pooled connections.
+        """
+        if not self._enabled:
+            return
+        semaphore = asyncio.Semaphore(TELEGRAM_POOL_SIZE)
+
+        async def send(message):
+            async with semaphore:
+                await self._send_text(_as_telegram_html(message))
+
+        await asyncio.gather(*(send(message) for message in messages))
 
 # Example Usage
 if __name__ == "__main__":
     async def main():
         telegram_bot = TelegramBot()
         await telegram_bot.send_message("GANGU PRO Telegram Bot is online and ready! (Test Message)")
+        await telegram_bot.close()
 
     # Run the async main function
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from utils.records import CandleStore
+
+FAST_PERIOD = 9
+SLOW_PERIOD = 21
+
+
+def window_sum(store, n):
+    """Sum of the last n stored closes, recomputed from the ring in float64."""
+    idx = (store.head - n + np.arange(n)) % store.capacity
+    return float(store.close[idx].astype(np.float64).sum())
+
+
+class CandleStoreTest(unittest.TestCase):
+    def test_running_sums_do_not_drift(self):
+        rng = np.random.default_rng(11)
+        store = CandleStore(200, FAST_PERIOD, SLOW_PERIOD)
+        # NSE-like prices on a 0.05 tick, random walk around 2500
+        closes = np.round((2500 + np.cumsum(rng.normal(0, 2, 20_000))) * 20) / 20
+        for i, close in enumerate(closes):
+            prev_fast, prev_slow = store.fast_sum, store.slow_sum
+            store.append(i * 60, close, close, close, close, 100)
+            self.assertEqual(store.prev_fast_sum, prev_fast)
+            self.assertEqual(store.prev_slow_sum, prev_slow)
+        self.assertIsInstance(store.fast_sum, float)
+        self.assertIsInstance(store.slow_sum, float)
+        self.assertAlmostEqual(store.fast_sum, window_sum(store, FAST_PERIOD), delta=1e-6)
+        self.assertAlmostEqual(store.slow_sum, window_sum(store, SLOW_PERIOD), delta=1e-6)
+
+    def test_sums_before_window_is_full(self):
+        store = CandleStore(200, FAST_PERIOD, SLOW_PERIOD)
+        for i, close in enumerate([100.0, 101.5, 99.25]):
+            store.append(i * 60, close, close, close, close, 100)
+        self.assertEqual(store.count, 3)
+        self.assertEqual(store.fast_sum, 300.75)
+        self.assertEqual(store.slow_sum, 300.75)
+        self.assertEqual(store.prev_slow_sum, 201.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
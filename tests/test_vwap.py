@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+from utils.helpers import OHLCVRing, VwapState
+
+# Reference session (same candles as the strategy examples) and its VWAP after each candle,
+# i.e. cumsum(typical_price * volume) / cumsum(volume) with typical price (high + low + close) / 3
+HIGHS = [100, 102, 101, 103, 104, 105, 106, 107]
+LOWS = [98, 99, 97, 98, 99, 100, 101, 102]
+CLOSES = [99, 101, 98, 100, 103, 104, 105, 106]
+VOLUMES = [1000, 1200, 900, 1500, 1100, 1300, 1000, 1400]
+EXPECTED_VWAP = [99.0, 99.9090909090909, 99.54838709677419, 99.80434782608695,
+                 100.2280701754386, 100.74285714285715, 101.15, 101.72340425531915]
+
+
+def reference_vwap(candles):
+    candles = np.asarray(candles, dtype=np.float64)
+    typical_price = (candles[:, 1] + candles[:, 2] + candles[:, 3]) / 3.0
+    return np.cumsum(typical_price * candles[:, 4]) / np.cumsum(candles[:, 4])
+
+
+class VwapStateTest(unittest.TestCase):
+    def test_matches_expected_series(self):
+        candles = OHLCVRing()
+        state = VwapState()
+        for high, low, close, volume, expected in zip(HIGHS, LOWS, CLOSES, VOLUMES, EXPECTED_VWAP):
+            candles.push(close, high, low, close, volume)
+            self.assertAlmostEqual(state.update_from_ring(candles), expected, delta=1e-9)
+
+    def test_batches_across_ring_wrap(self):
+        rng = np.random.default_rng(7)
+        candles = OHLCVRing(capacity=7)
+        state = VwapState()
+        pushed = []
+        for batch in rng.integers(1, 7, size=40): # Up to capacity - 1 candles between updates
+            for _ in range(batch):
+                candle = rng.uniform(90, 110, size=5)
+                pushed.append(candle)
+                candles.push(*candle)
+            self.assertAlmostEqual(state.update_from_ring(candles), reference_vwap(pushed)[-1], delta=1e-9)
+        self.assertGreater(candles.total, candles.capacity)
+
+    def test_reset_starts_new_session(self):
+        candles = OHLCVRing()
+        state = VwapState()
+        for high, low, close, volume in zip(HIGHS, LOWS, CLOSES, VOLUMES):
+            candles.push(close, high, low, close, volume)
+        state.update_from_ring(candles)
+
+        candles.reset()
+        session = [(100, 110, 90, 105, 10), (105, 106, 104, 105, 30)]
+        for candle in session:
+            candles.push(*candle)
+        self.assertAlmostEqual(state.update_from_ring(candles), reference_vwap(session)[-1], delta=1e-9)
+
+    def test_reset_detected_when_new_session_is_longer(self):
+        candles = OHLCVRing()
+        state = VwapState()
+        candles.push(100, 101, 99, 100, 1000)
+        state.update_from_ring(candles)
+
+        candles.reset()
+        session = [(200, 201, 199, 200, 10)] * 3 # More candles than the previous session had
+        for candle in session:
+            candles.push(*candle)
+        self.assertAlmostEqual(state.update_from_ring(candles), reference_vwap(session)[-1], delta=1e-9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+import queue
+import weakref
+from threading import Lock, Thread
+import websockets
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardPushServer:
+    """
+    WebSocket server in main.py that pushes state changes to connected dashboards.
+    Messages are JSON objects such as {"ltp": {symbol: ltp}} or {"signals": {symbol: {...}}}.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.clients = set()
+        self.loop = None
+        self.server = None
+
+    async def _handler(self, websocket, path=None):
+        self.clients.add(websocket)
+        try:
+            await websocket.wait_closed()
+        finally:
+            self.clients.discard(websocket)
+
+    async def start(self):
+        """Starts serving on the running event loop."""
+        self.loop = asyncio.get_running_loop()
+        self.server = await websockets.serve(self._handler, self.host, self.port)
+        logger.info("Dashboard push server listening on ws://%s:%s", self.host, self.port)
+
+    def _broadcast(self, update):
+        if self.clients:
+            websockets.broadcast(self.clients, _dumps(update))
+
+    def publish(self, update):
+        """Sends an update to all dashboards. Safe to call from any thread."""
+        if self.loop is None or not self.clients:
+            return
+        self.loop.call_soon_threadsafe(self._broadcast, update)
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+class DashboardSubscription:
+    """Updates received by a DashboardPushClient for one dashboard session."""
+
+    def __init__(self):
+        self.updates = queue.SimpleQueue()
+
+    def drain(self):
+        """Returns all updates received since the last call (possibly none)."""
+        updates = []
+        while True:
+            try:
+                updates.append(self.updates.get_nowait())
+            except queue.Empty:
+                return updates
+
+
+class DashboardPushClient:
+    """
+    Background WebSocket client for the dashboard, one per process: each dashboard session
+    gets its own DashboardSubscription from subscribe(), and every update is copied to all of them.
+    Subscriptions are held weakly, so one is dropped once its session is gone.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._subscribers = weakref.WeakSet()
+        self._lock = Lock() # subscribe() runs on Streamlit's threads, _consume on the client thread
+        self.thread = Thread(target=lambda: asyncio.run(self._consume()), daemon=True)
+        self.thread.start()
+
+    def subscribe(self):
+        """Returns a new subscription receiving every update from now on."""
+        subscription = DashboardSubscription()
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _dispatch(self, update):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.updates.put(update)
+
+    async def _consume(self):
+        while True:
+            try:
+                async with websockets.connect(self.url) as websocket:
+                    logger.info("Connected to dashboard push server at %s", self.url)
+                    async for message in websocket:
+                        self._dispatch(_loads(message))
+            except (OSError, websockets.exceptions.WebSocketException):
+                pass # main.py not running or restarted; retry below
+            await asyncio.sleep(2)
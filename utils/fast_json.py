@@ -0,0 +1,56 @@
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class FastJSON:
+    """
+    Stand-in for the json module that parses and serializes with orjson.
+    Calls with extra keyword arguments (indent, object_hook, ...) and objects orjson
+    cannot serialize fall back to the stdlib json module, as do all other attributes.
+    """
+
+    JSONDecodeError = json.JSONDecodeError  # orjson.JSONDecodeError subclasses it
+
+    def __getattr__(self, name):
+        return getattr(json, name)
+
+    @staticmethod
+    def loads(s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        if not kwargs:
+            try:
+                return orjson.dumps(obj).decode()
+            except TypeError:
+                pass
+        return json.dumps(obj, **kwargs)
+
+
+def use_fast_json(*modules):
+    """
+    Makes the given modules (e.g., Fyers SDK modules) use orjson for their JSON work
+    by replacing their module-level `json` reference. No-op when orjson is not installed.
+
+    :param modules: Imported modules that did `import json`
+    :return: Number of modules patched
+    """
+    if orjson is None:
+        return 0
+    patched = 0
+    for module in modules:
+        if getattr(module, 'json', None) is json:
+            module.json = FastJSON()
+            patched += 1
+    logger.debug("orjson enabled for %d module(s)", patched)
+    return patched
@@ -1,37 +1,342 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+from pathlib import Path
+from time import time_ns
+import numpy as np
 
-def setup_logging(app_log_path, fyers_data_log_path, fyers_req_log_path):
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_MAX_BYTES = 10_000_000 # Rotate log files at ~10 MB
+LOG_BACKUP_COUNT = 5 # Rotated files kept per log
+LOG_BUFFER_SIZE = 1024 * 1024 # Write buffer of high-volume logs (see _BufferedRotatingFileHandler)
+DATA_LOG_MAX_BYTES = 100 * 1024 * 1024 # Rotate the per-tick Fyers data socket log at 100 MiB
+OHLCV_RING_CAPACITY = 512 # Candles kept per symbol; a 375-minute NSE session of 1-minute candles fits
+SIGNAL_BUFFER_CAPACITY = 4096 # Signals buffered between writes (see SignalBuffer)
+
+# One strategy signal: epoch ns, symbol row, strategy (STRATEGY_*), side (1 BUY / -1 SELL), LTP
+SIGNAL_DTYPE = np.dtype([('ts', 'i8'), ('symbol', 'i4'), ('strategy', 'i1'), ('side', 'i1'), ('ltp', 'f4')])
+STRATEGY_ORB, STRATEGY_VWAP, STRATEGY_GY = 0, 1, 2
+
+class _BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
     """
-    Sets up logging for the application.
+    RotatingFileHandler writing through a LOG_BUFFER_SIZE buffer. The buffer is flushed for
+    WARNING and above, on rotation and on close, instead of after every record.
+    The file size is counted here rather than read from the stream: seek()/tell() on a
+    text stream flush its buffer, which RotatingFileHandler.shouldRollover does per record.
     """
-    # Create logs directory if it doesn't exist
-    os.makedirs(os.path.dirname(app_log_path), exist_ok=True)
 
-    # Main application logger
+    def _open(self):
+        stream = open(self.baseFilename, self.mode, buffering=LOG_BUFFER_SIZE,
+                      encoding=self.encoding, errors=self.errors)
+        self._size = os.fstat(stream.fileno()).st_size # Appending continues an existing file
+        return stream
+
+    def shouldRollover(self, record):
+        # The record about to be written is not counted, so a file may end one record past maxBytes
+        return self.stream is not None and 0 < self.maxBytes <= self._size
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            msg = self.format(record) + self.terminator
+            self.stream.write(msg)
+            self._size += len(msg) # Characters; equal to bytes for the ASCII the SDK logs
+            if record.levelno >= logging.WARNING:
+                self.stream.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+def _file_handler(log_path, max_bytes=LOG_MAX_BYTES, buffered=False):
+    """
+    Size-rotated file handler; the file is only opened when the first record is written.
+    :param buffered: Buffer writes (see _BufferedRotatingFileHandler) instead of flushing every record
+    """
+    Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+    handler_class = _BufferedRotatingFileHandler if buffered else logging.handlers.RotatingFileHandler
+    return handler_class(log_path, maxBytes=max_bytes, backupCount=LOG_BACKUP_COUNT, delay=True)
+
+def _queue_handler(*handlers):
+    """
+    Returns a QueueHandler whose records are written to handlers by a background listener thread,
+    so the logging thread only pays for a queue put.
+    """
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop) # Flush queued records on exit
+    return logging.handlers.QueueHandler(log_queue)
+
+def configure_root_logging(log_path, fmt=LOG_FORMAT):
+    """
+    Configures the root logger to write to log_path and the console from a background thread.
+    Does nothing if the root logger already has handlers, so modules loaded into the
+    same process don't stack duplicate handlers (or open unused log files).
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return False
+
+    # None of the formats use thread/process fields; skip looking them up for every record
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    # Records are only queued by the logging thread; a background listener does the file/console writes
+    formatter = logging.Formatter(fmt)
+    file_handler = _file_handler(log_path)
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler() # Output to console as well
+    console_handler.setFormatter(formatter)
+
     logging.basicConfig(
         level=logging.INFO, # Default level
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(app_log_path),
-            logging.StreamHandler() # Output to console as well
-        ]
+        format='%(message)s', # QueueHandler only merges args into the message; the listener formats
+        handlers=[_queue_handler(file_handler, console_handler)]
     )
-    
-    # Configure Fyers data socket logger
-    fyers_data_logger = logging.getLogger("FyersWebsocket")
-    fyers_data_logger.setLevel(logging.INFO)
-    fyers_data_handler = logging.FileHandler(fyers_data_log_path)
-    fyers_data_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    fyers_data_logger.addHandler(fyers_data_handler)
-    fyers_data_logger.propagate = False # Prevent messages from going to root logger
-
-    # Configure Fyers requests logger (for FyersAPI calls)
-    fyers_req_logger = logging.getLogger("FyersAPI")
-    fyers_req_logger.setLevel(logging.INFO)
-    fyers_req_handler = logging.FileHandler(fyers_req_log_path)
-    fyers_req_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    fyers_req_logger.addHandler(fyers_req_handler)
-    fyers_req_logger.propagate = False # Prevent messages from going to root logger
-
-    logging.info("Logging setup complete.")
\ No newline at end of file
+    return True
+
+def _configure_file_logger(name, log_path, level=logging.INFO, **handler_options):
+    """
+    Sends a logger's records (level and up) only to its own file, written off-thread.
+    :param handler_options: Passed to _file_handler (max_bytes, buffered)
+    """
+    file_logger = logging.getLogger(name)
+    file_logger.setLevel(level)
+    file_handler = _file_handler(log_path, **handler_options)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    file_logger.addHandler(_queue_handler(file_handler))
+    file_logger.propagate = False # Prevent messages from going to root logger
+
+def setup_logging(app_log_path, fyers_data_log_path, fyers_req_log_path, fyers_data_log_level=logging.INFO):
+    """
+    Sets up logging for the application.
+    :param fyers_data_log_level: Level of the per-tick FyersWebsocket logger
+                                 (e.g., config.FYERS_DATA_LOG_LEVEL; "WARNING" in production)
+    """
+    # Main application logger
+    configure_root_logging(app_log_path)
+
+    if logging.getLogger("FyersWebsocket").handlers:
+        return # Already set up in this process
+    # Fyers data socket logger (per-tick volume, so buffered and rotated less often)
+    _configure_file_logger("FyersWebsocket", fyers_data_log_path, fyers_data_log_level,
+                           max_bytes=DATA_LOG_MAX_BYTES, buffered=True)
+    # Fyers requests logger (for FyersAPI calls)
+    _configure_file_logger("FyersAPI", fyers_req_log_path)
+
+    logging.info("Logging setup complete.")
+
+class VwapState:
+    """
+    Running session VWAP for one symbol, updated in O(1) per candle.
+    Typical price is (high + low + close) / 3, as in pandas_ta.
+    """
+
+    __slots__ = ('cum_pv', 'cum_vol', 'vwap', 'count', 'session')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Starts a new session."""
+        self.cum_pv = 0.0
+        self.cum_vol = 0.0
+        self.vwap = None # None until a candle with volume arrives
+        self.count = 0 # Candles consumed this session
+        self.session = None # OHLCVRing.session consumed by update_from_ring
+
+    def update(self, high, low, close, volume):
+        """Adds one completed candle and returns the updated VWAP."""
+        self.cum_pv += (high + low + close) / 3.0 * volume
+        self.cum_vol += volume
+        if self.cum_vol:
+            self.vwap = self.cum_pv / self.cum_vol
+        self.count += 1
+        return self.vwap
+
+    def update_from_ring(self, candles):
+        """
+        Consumes the candles pushed to an OHLCVRing since the last call and returns the VWAP.
+        A ring that was reset since the last call starts a new session.
+        Call it at least once per ring capacity candles; overwritten candles cannot be consumed.
+        :param candles: OHLCVRing holding the session's candles
+        """
+        total = candles.total
+        if candles.session != self.session:
+            self.reset()
+            self.session = candles.session
+        if total > self.count:
+            # All new candles in one vectorized pass (the first call may bring the whole session)
+            new = candles.window(total - self.count)
+            volumes = new[:, 4]
+            self.cum_pv += float(((new[:, 1] + new[:, 2] + new[:, 3]) / 3.0 * volumes).sum())
+            self.cum_vol += float(volumes.sum())
+            if self.cum_vol:
+                self.vwap = self.cum_pv / self.cum_vol
+            self.count = total
+        return self.vwap
+
+
+class OHLCVRing:
+    """
+    The latest candles of one symbol in a preallocated (capacity, 5) float64 array,
+    one row per candle: open, high, low, close, volume. Pushing a candle when full
+    overwrites the oldest one, so nothing is reallocated or copied as the session grows.
+    """
+
+    def __init__(self, capacity=OHLCV_RING_CAPACITY):
+        self.capacity = capacity
+        self.data = np.empty((capacity, 5), dtype=np.float64)
+        self.total = 0 # Candles pushed since the last reset (not capped at capacity)
+        self.session = 0 # Incremented by reset()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def reset(self):
+        """Starts a new session."""
+        self.total = 0
+        self.session += 1
+
+    def push(self, open_, high, low, close, volume):
+        """Adds a completed candle."""
+        row = self.data[self.total % self.capacity]
+        row[0] = open_
+        row[1] = high
+        row[2] = low
+        row[3] = close
+        row[4] = volume
+        self.total += 1
+
+    def _rows(self, first, n):
+        """n stored candles starting at candle number first, oldest first (a view unless they wrap)."""
+        start = first % self.capacity
+        end = start + n
+        if end <= self.capacity:
+            return self.data[start:end]
+        return np.concatenate((self.data[start:], self.data[:end - self.capacity]))
+
+    def window(self, n):
+        """
+        Returns the latest n candles (fewer if not stored), oldest first.
+        The result may be a view of the buffer; copy it to keep it past the next push.
+        """
+        n = min(n, len(self))
+        return self._rows(self.total - n, n)
+
+    def first(self, n):
+        """Returns the session's first n candles, oldest first (none once they have been overwritten)."""
+        n = min(n, self.total) if self.total <= self.capacity else 0
+        return self._rows(0, n)
+
+
+class SymbolArrays:
+    """
+    Per-symbol fields stored as one NumPy array per field (struct-of-arrays).
+    Each symbol gets a row the first time row() is called; values start as NaN.
+    """
+
+    def __init__(self, *fields, capacity=8, symbols=(), dtype=np.float32):
+        """
+        :param fields: Field names, e.g. "high", "low"
+        :param capacity: Initial number of rows (doubled whenever it runs out)
+        :param dtype: Float dtype of every field; float32 (~7 significant digits) is ample for
+                      price levels compared against LTPs and halves the memory read per check
+        :param symbols: Symbols to give the first rows up front, in this order, so several
+                        tables built with the same list line up row for row
+        """
+        self.index = {} # symbol -> row
+        self.symbols = [] # row -> symbol
+        self.dtype = dtype
+        self.columns = {field: np.full(max(capacity, len(symbols)), np.nan, dtype=dtype) for field in fields}
+        for symbol in symbols:
+            self.row(symbol)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def row(self, symbol):
+        """Returns the row of symbol, adding it if needed. Adding may reallocate the columns."""
+        i = self.index.get(symbol)
+        if i is None:
+            i = len(self.symbols)
+            capacity = len(next(iter(self.columns.values())))
+            if i == capacity:
+                for field, column in self.columns.items():
+                    grown = np.full(capacity * 2, np.nan, dtype=self.dtype)
+                    grown[:capacity] = column
+                    self.columns[field] = grown
+            self.index[symbol] = i
+            self.symbols.append(symbol)
+        return i
+
+    def __getitem__(self, field):
+        """Returns a view of the field for all added symbols (in row order)."""
+        return self.columns[field][:len(self.symbols)]
+
+
+class SignalBuffer:
+    """
+    Buffer of strategy signals (SIGNAL_DTYPE records), recorded instead of logging each signal.
+    Records are appended to a binary file in batches: whenever the buffer is full, on flush()
+    and at interpreter exit, so no signal is dropped.
+    Symbols are stored as row numbers; give the strategies the same symbols list to decode them.
+    Read the file back with np.fromfile(path, dtype=SIGNAL_DTYPE).
+    """
+
+    def __init__(self, path, capacity=SIGNAL_BUFFER_CAPACITY):
+        """
+        :param path: File the records are appended to (e.g., logs/signals.bin)
+        :param capacity: Records buffered between writes
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=SIGNAL_DTYPE)
+        self.count = 0 # Records buffered, not yet written
+        atexit.register(self.flush)
+
+    def push(self, symbol, strategy, side, ltp):
+        """Records one signal; side is 1 (BUY) or -1 (SELL)."""
+        if self.count == self.capacity:
+            self.flush()
+        self.records[self.count] = (time_ns(), symbol, strategy, side, ltp)
+        self.count += 1
+
+    def push_many(self, symbols, strategy, sides, ltps):
+        """Records several signals of one strategy from arrays of symbol rows, sides and LTPs."""
+        n = len(symbols)
+        if self.count + n > self.capacity:
+            self.flush()
+        if n > self.capacity:
+            records = np.empty(n, dtype=SIGNAL_DTYPE)
+        else:
+            records = self.records[self.count:self.count + n]
+        records['ts'] = time_ns()
+        records['symbol'] = symbols
+        records['strategy'] = strategy
+        records['side'] = sides
+        records['ltp'] = ltps
+        if n > self.capacity:
+            self._write(records)
+        else:
+            self.count += n
+
+    def flush(self):
+        """Appends the buffered records to the file; returns how many were written."""
+        n = self.count
+        if n:
+            self._write(self.records[:n])
+            self.count = 0
+        return n
+
+    def _write(self, records):
+        with open(self.path, 'ab') as f:
+            records.tofile(f)
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+import numpy as np
+
+
+@dataclass(slots=True)
+class TradeRecord:
+    """State of one trade shown on the dashboard (slots: no per-record __dict__)."""
+    order_id: str
+    symbol: str
+    status: str # "PENDING" / "FILLED"
+    pnl: float
+    trailing_sl_target: str = "N/A"
+
+
+@dataclass(slots=True)
+class LiveCandle:
+    """Latest state of a symbol's current 1-minute candle, as received from the Fyers WebSocket."""
+    ts_epoch: int # Candle epoch seconds
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+    cumulative_day_volume: int
+
+
+class LiveCandleTable:
+    """
+    Current 1-minute candle of every symbol, one NumPy array per field indexed by symbol id.
+    Ticks overwrite a row in place; a LiveCandle is only built when a candle closes (snapshot()).
+    """
+
+    def __init__(self, n_symbols):
+        self.ts = np.zeros(n_symbols, dtype=np.int64)  # Candle epoch seconds, 0 = no tick yet
+        self.open = np.zeros(n_symbols, dtype=np.float64)
+        self.high = np.zeros(n_symbols, dtype=np.float64)
+        self.low = np.zeros(n_symbols, dtype=np.float64)
+        self.close = np.zeros(n_symbols, dtype=np.float64)
+        self.volume = np.zeros(n_symbols, dtype=np.int64)
+        self.cumulative_day_volume = np.zeros(n_symbols, dtype=np.int64)
+
+    def snapshot(self, i):
+        """Returns row i as a LiveCandle of plain Python numbers."""
+        return LiveCandle(int(self.ts[i]), float(self.open[i]), float(self.high[i]),
+                          float(self.low[i]), float(self.close[i]), int(self.volume[i]),
+                          int(self.cumulative_day_volume[i]))
+
+
+class CandleStore:
+    """
+    Completed 1-minute candles for one symbol, stored as a fixed-capacity ring buffer
+    with one NumPy array per field (struct-of-arrays).
+    Running sums of the last fast_period / slow_period closes are kept
+    (current and before the latest close) so SMAs are O(1) per candle.
+    """
+
+    def __init__(self, capacity, fast_period, slow_period):
+        self.capacity = capacity
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.ts = np.zeros(capacity, dtype=np.int64)  # Candle epoch seconds
+        # float32 is exact enough for NSE prices (0.05 ticks) and halves the footprint
+        self.open = np.zeros(capacity, dtype=np.float32)
+        self.high = np.zeros(capacity, dtype=np.float32)
+        self.low = np.zeros(capacity, dtype=np.float32)
+        self.close = np.zeros(capacity, dtype=np.float32)
+        self.volume = np.zeros(capacity, dtype=np.int64)
+        self.head = 0  # Next write position
+        self.count = 0  # Number of candles stored (capped at capacity)
+        # Python floats (float64): a float32 array element would turn them into np.float32
+        # under NumPy 2 and every later update would round to float32
+        self.fast_sum = 0.0
+        self.slow_sum = 0.0
+        self.prev_fast_sum = 0.0
+        self.prev_slow_sum = 0.0
+
+    def append(self, ts, open_, high, low, close, volume):
+        """Adds a completed candle, overwriting the oldest one when full."""
+        head = self.head
+        closes = self.close
+
+        self.prev_fast_sum = self.fast_sum
+        self.prev_slow_sum = self.slow_sum
+        # Drop the close that leaves each SMA window once the window is full
+        if self.count >= self.fast_period:
+            self.fast_sum -= float(closes[(head - self.fast_period) % self.capacity])
+        if self.count >= self.slow_period:
+            self.slow_sum -= float(closes[(head - self.slow_period) % self.capacity])
+        closes[head] = close
+        # Add the stored (float32-rounded) close so the same value leaves the window later
+        close = float(closes[head])
+        self.fast_sum += close
+        self.slow_sum += close
+
+        self.ts[head] = ts
+        self.open[head] = open_
+        self.high[head] = high
+        self.low[head] = low
+        self.volume[head] = volume or 0
+        self.head = (head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
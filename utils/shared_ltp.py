@@ -0,0 +1,64 @@
+import logging
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One fixed-size record per symbol: last traded price and its epoch timestamp (seconds)
+LTP_DTYPE = np.dtype([('ltp', 'f8'), ('ts', 'u8')])
+
+
+class SharedLTPBuffer:
+    """
+    Fixed-layout LTP table in shared memory, written by main.py and read by the dashboard.
+    Record i holds the LTP of symbols[i], so both processes must use the same symbol list.
+    """
+
+    def __init__(self, symbols, name, create=False):
+        """
+        :param symbols: Ordered list of Fyers symbols (e.g., ["NSE:SBIN-EQ", ...])
+        :param name: Shared memory block name
+        :param create: True for the writer process, False to attach to an existing block
+        """
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        size = max(1, len(self.symbols) * LTP_DTYPE.itemsize)
+
+        if create:
+            try:
+                self.shm = SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # Left over from a previous run; reuse it if it is big enough
+                self.shm = SharedMemory(name=name)
+                if self.shm.size < size:
+                    self.shm.close()
+                    self.shm.unlink()
+                    self.shm = SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = SharedMemory(name=name)  # Raises FileNotFoundError if the writer is not running
+            # Readers must not unlink the block when they exit (resource_tracker would do so)
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        self.owner = create
+        self.array = np.ndarray((len(self.symbols),), dtype=LTP_DTYPE, buffer=self.shm.buf)
+        if create:
+            self.array[:] = 0
+
+    def write(self, symbol, ltp, ts):
+        """Stores the LTP for a symbol. Symbols outside the shared layout are ignored."""
+        i = self.index.get(symbol)
+        if i is not None:
+            self.array[i] = (ltp, ts)
+
+    def read(self):
+        """Returns {symbol: ltp} for every symbol that has received a price."""
+        snapshot = self.array.copy()
+        return {symbol: float(snapshot['ltp'][i]) for i, symbol in enumerate(self.symbols) if snapshot['ts'][i]}
+
+    def close(self):
+        """Detaches from the shared memory block; the writer also removes it."""
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()